@@ -1,11 +1,11 @@
 import pathlib
-import time
 from typing import Tuple
 
 import torch
 from torch.utils.data import DataLoader
 from tqdm.auto import tqdm
 
+from tali.bench import time_iterator
 from tali.data import (
     SubModalityTypes,
     TALIBaseTransform,
@@ -13,6 +13,7 @@ from tali.data import (
     VideoFramesFormat,
     default_transforms,
     load_dataset_via_hub,
+    prepare_streaming_dataset,
 )
 
 
@@ -56,7 +57,8 @@ def tali_with_transforms_no_streaming(
                 SubModalityTypes.wikipedia_main_body_text,
                 SubModalityTypes.wikipedia_title_text,
             ],
-            video_frames_format=VideoFramesFormat.PIL,
+            video_frames_format=VideoFramesFormat.TENSOR.value,
+            video_frames_uint8=True,
         ),
     )
 
@@ -106,7 +108,8 @@ def tali_without_transforms_no_streaming(
                 SubModalityTypes.wikipedia_main_body_text,
                 SubModalityTypes.wikipedia_title_text,
             ],
-            video_frames_format=VideoFramesFormat.PIL,
+            video_frames_format=VideoFramesFormat.TENSOR.value,
+            video_frames_uint8=True,
         ),
     )
 
@@ -164,12 +167,16 @@ def tali_with_transforms_streaming(
                 SubModalityTypes.wikipedia_main_body_text,
                 SubModalityTypes.wikipedia_title_text,
             ],
-            video_frames_format=VideoFramesFormat.PIL,
+            video_frames_format=VideoFramesFormat.TENSOR.value,
+            video_frames_uint8=True,
         ),
     )
 
+    dataset = prepare_streaming_dataset(
+        dataset, transform=preprocessing_transform
+    )
+
     for sample in tqdm(dataset):
-        sample = preprocessing_transform(sample)
         print(list(sample.keys()))
         for key, value in sample.items():
             if hasattr(value, "shape") or isinstance(value, torch.Tensor):
@@ -213,12 +220,16 @@ def tali_without_transforms_streaming(
                 SubModalityTypes.wikipedia_main_body_text,
                 SubModalityTypes.wikipedia_title_text,
             ],
-            video_frames_format=VideoFramesFormat.PIL,
+            video_frames_format=VideoFramesFormat.TENSOR.value,
+            video_frames_uint8=True,
         ),
     )
 
+    dataset = prepare_streaming_dataset(
+        dataset, transform=preprocessing_transform
+    )
+
     for sample in tqdm(dataset):
-        sample = preprocessing_transform(sample)
         print(list(sample.keys()))
         for key, value in sample.items():
             if hasattr(value, "shape") or isinstance(value, torch.Tensor):
@@ -236,6 +247,8 @@ def measure_dataloader_speed(
 ) -> Tuple[float, float]:
     """Measure the speed of a dataloader.
 
+    Times how long fetching each batch blocks, see tali.bench.time_iterator.
+
     Args:
         dataloader: DataLoader to measure
         num_batches: Number of batches to process
@@ -243,28 +256,9 @@ def measure_dataloader_speed(
     Returns:
         Tuple of (average time per batch, samples per second)
     """
-    total_time = 0
-    total_samples = 0
-
-    for i, batch in enumerate(tqdm(dataloader, total=num_batches)):
-        if i >= num_batches:
-            break
-
-        start_time = time.time()
-        # Simulate processing by accessing the batch
-        for key, value in batch.items():
-            if isinstance(value, torch.Tensor):
-                _ = value.shape
-        end_time = time.time()
-
-        batch_time = end_time - start_time
-        total_time += batch_time
-        total_samples += dataloader.batch_size
-
-    avg_time = total_time / num_batches
-    samples_per_sec = total_samples / total_time
+    result = time_iterator(dataloader, num_batches=num_batches)
 
-    return avg_time, samples_per_sec
+    return result["batch_wait"]["mean"], result["samples_per_second"]
 
 
 def tali_dataloader_speed_test(
@@ -318,7 +312,8 @@ def tali_dataloader_speed_test(
                 SubModalityTypes.wikipedia_main_body_text,
                 SubModalityTypes.wikipedia_title_text,
             ],
-            video_frames_format=VideoFramesFormat.PIL,
+            video_frames_format=VideoFramesFormat.TENSOR.value,
+            video_frames_uint8=True,
         ),
     )
 
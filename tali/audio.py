@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import functools
+
+from tali.utils import lazy_import
+
+torch = lazy_import("torch")
+TAF = lazy_import("torchaudio.functional")
+
+# log10 of the smallest power Whisper keeps, the value of a silent frame
+_SILENT_LOG_MEL = -10.0
+
+
+@functools.lru_cache
+def whisper_mel_filters(
+    num_mel_bins: int = 80, n_fft: int = 400, sampling_rate: int = 16000
+) -> torch.Tensor:
+    """Whisper's Slaney mel filterbank as ``(num_mel_bins, n_fft // 2 + 1)``,
+    built once per process."""
+    return TAF.melscale_fbanks(
+        n_freqs=n_fft // 2 + 1,
+        f_min=0.0,
+        f_max=sampling_rate / 2,
+        n_mels=num_mel_bins,
+        sample_rate=sampling_rate,
+        norm="slaney",
+        mel_scale="slaney",
+    ).T.contiguous()
+
+
+@functools.lru_cache
+def _hann_window(n_fft: int) -> torch.Tensor:
+    return torch.hann_window(n_fft)
+
+
+def whisper_log_mel_spectrogram(
+    waveforms: torch.Tensor | list[torch.Tensor],
+    num_mel_bins: int = 80,
+    sampling_rate: int = 16000,
+    n_fft: int = 400,
+    hop_length: int = 160,
+    chunk_length: int = 30,
+) -> torch.Tensor:
+    """Whisper's log-mel input features for a batch of waveforms 🔊
+
+    Matches ``WhisperFeatureExtractor``: waveforms are padded with zeros
+    or truncated to ``chunk_length`` seconds, and each gets a power STFT,
+    the mel filterbank, a log10 clamped to 8 below its maximum and the
+    ``(x + 4) / 4`` scaling. The STFT runs once over the batch, and only
+    up to the end of the longest waveform. The frames after it only see
+    zero padding, and their value is known without computing them.
+
+    Args:
+        waveforms (torch.Tensor | list[torch.Tensor]): ``(B, T)`` or
+            ``(T,)`` waveforms at ``sampling_rate``, or a list of 1D
+            waveforms of any lengths.
+        num_mel_bins (int): 80, or 128 for large-v3 models.
+        sampling_rate (int): Sample rate of the waveforms.
+        n_fft (int): STFT window size.
+        hop_length (int): STFT hop size.
+        chunk_length (int): Seconds of audio the features cover.
+
+    Returns:
+        ``(B, num_mel_bins, chunk_length * sampling_rate // hop_length)``
+        float32 input features.
+    """
+    if isinstance(waveforms, torch.Tensor):
+        waveforms = waveforms.reshape(-1, waveforms.shape[-1])
+    else:
+        waveforms = torch.nn.utils.rnn.pad_sequence(
+            [waveform.reshape(-1) for waveform in waveforms],
+            batch_first=True,
+        )
+    num_samples = chunk_length * sampling_rate
+    num_frames = num_samples // hop_length
+    waveforms = waveforms[:, :num_samples].to(torch.float32)
+
+    # Zero padding of at least half a window keeps the reflect padding of
+    # torch.stft equal to that of the full chunk's trailing zeros
+    num_stft_samples = min(
+        num_samples,
+        -(-(waveforms.shape[1] + n_fft) // hop_length) * hop_length,
+    )
+    waveforms = torch.nn.functional.pad(
+        waveforms, (0, num_stft_samples - waveforms.shape[1])
+    )
+    stft = torch.stft(
+        waveforms,
+        n_fft,
+        hop_length,
+        window=_hann_window(n_fft).to(waveforms.device),
+        return_complex=True,
+    )
+    num_stft_frames = min(num_frames, num_stft_samples // hop_length)
+    magnitudes = (stft[..., :num_stft_frames].abs() ** 2).contiguous()
+
+    mel_filters = whisper_mel_filters(num_mel_bins, n_fft, sampling_rate)
+    log_spec = torch.clamp(
+        mel_filters.to(waveforms.device) @ magnitudes, min=1e-10
+    ).log10()
+    log_spec = torch.nn.functional.pad(
+        log_spec,
+        (0, num_frames - num_stft_frames),
+        value=_SILENT_LOG_MEL,
+    )
+
+    max_value = log_spec.amax(dim=(1, 2), keepdim=True)
+    log_spec = torch.maximum(log_spec, max_value - 8.0)
+    return (log_spec + 4.0) / 4.0
@@ -0,0 +1,451 @@
+import io
+import json
+import pathlib
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from collections.abc import Callable, Iterable
+
+import av
+import datasets
+import numpy as np
+import torch
+from torch.utils.data import DataLoader
+
+from tali.data import (
+    SubModalityTypes,
+    TALIBaseTransform,
+    TALIBaseTransformConfig,
+    build_subtitle_index,
+    default_transforms,
+    extract_audio,
+    get_video_tensors,
+    load_dataset_from_parquet,
+)
+from tali.synthetic import SyntheticDatasetConfig, write_synthetic_dataset
+
+BENCHMARK_MODALITY_LISTS = {
+    "text": [
+        SubModalityTypes.youtube_title_text,
+        SubModalityTypes.youtube_description_text,
+        SubModalityTypes.youtube_subtitle_text,
+        SubModalityTypes.wikipedia_caption_text,
+    ],
+    "image_text": [
+        SubModalityTypes.wikipedia_caption_image,
+        SubModalityTypes.wikipedia_caption_text,
+    ],
+    "video": [SubModalityTypes.youtube_content_video],
+    "audio": [SubModalityTypes.youtube_content_audio],
+    "all": list(SubModalityTypes),
+}
+
+STAGES = (
+    "arrow_read",
+    "container_open",
+    "decode",
+    "colour_conversion",
+    "resize",
+    "audio_resample",
+    "subtitle_parse",
+    "text_tokenizer",
+    "image_tokenizer",
+    "audio_tokenizer",
+)
+
+# Modules tali.data loads on first use only, see tali.utils.lazy_import
+LAZY_MODULES = ("torch", "datasets", "torchvision", "torchaudio", "av")
+
+
+def summarise_latencies(latencies: list[float]) -> dict[str, float]:
+    """p50/p95/p99, mean and total of latencies in seconds."""
+    if len(latencies) == 0:
+        return {"count": 0}
+    latencies = np.asarray(latencies)
+    return {
+        "count": len(latencies),
+        "mean": float(latencies.mean()),
+        "p50": float(np.percentile(latencies, 50)),
+        "p95": float(np.percentile(latencies, 95)),
+        "p99": float(np.percentile(latencies, 99)),
+        "total": float(latencies.sum()),
+    }
+
+
+def _num_samples(batch) -> int:
+    if isinstance(batch, dict):
+        value = batch.get("item_idx", next(iter(batch.values())))
+        return len(value)
+    return len(batch)
+
+
+def _collate_as_list(batch: list) -> list:
+    return batch
+
+
+def time_iterator(
+    iterable: Iterable, num_batches: int, warmup_batches: int = 1
+) -> dict:
+    """Times how long each ``next()`` on ``iterable`` blocks.
+
+    This is the time a training loop waits for data. Samples are counted
+    from the batches themselves, so collate functions that change the
+    batch size are accounted for.
+
+    Args:
+        iterable (Iterable): Usually a DataLoader.
+        num_batches (int): Batches to time, after the warmup.
+        warmup_batches (int): Batches fetched first and not timed, which
+            covers worker start-up.
+
+    Returns:
+        dict: The wait latencies summary, batches, samples and samples/s.
+    """
+    iterator = iter(iterable)
+    waits = []
+    num_samples = 0
+    measure_start = time.perf_counter()
+    for batch_idx in range(warmup_batches + num_batches):
+        if batch_idx == warmup_batches:
+            measure_start = time.perf_counter()
+        wait_start = time.perf_counter()
+        try:
+            batch = next(iterator)
+        except StopIteration:
+            break
+        if batch_idx >= warmup_batches:
+            waits.append(time.perf_counter() - wait_start)
+            num_samples += _num_samples(batch)
+    elapsed = time.perf_counter() - measure_start
+
+    return {
+        "num_batches": len(waits),
+        "num_samples": num_samples,
+        "samples_per_second": num_samples / elapsed if elapsed > 0 else 0.0,
+        "batch_wait": summarise_latencies(waits),
+    }
+
+
+def benchmark_dataloader(
+    dataset: datasets.Dataset,
+    transform: Callable,
+    batch_size: int,
+    num_workers: int,
+    num_batches: int,
+    warmup_batches: int = 1,
+    seed: int = 42,
+) -> dict:
+    """Times a shuffled DataLoader applying ``transform`` per batch."""
+    dataloader = DataLoader(
+        dataset.with_transform(transform),
+        batch_size=batch_size,
+        shuffle=True,
+        num_workers=num_workers,
+        collate_fn=_collate_as_list,
+        generator=torch.Generator().manual_seed(seed),
+        persistent_workers=False,
+    )
+    return time_iterator(dataloader, num_batches, warmup_batches)
+
+
+def _timed(timings: dict, stage: str, function: Callable, *args, **kwargs):
+    start = time.perf_counter()
+    output = function(*args, **kwargs)
+    timings[stage].append(time.perf_counter() - start)
+    return output
+
+
+def benchmark_stages(
+    dataset: datasets.Dataset,
+    num_samples: int = 16,
+    image_size: int = 224,
+    clip_duration_in_seconds: float = 3.0,
+    num_audio_frames: int = 16000 * 3,
+    transforms: tuple | None = None,
+) -> dict[str, dict[str, float]]:
+    """Times the stages of turning a TALI row into model inputs, one at a
+    time and on the first ``num_samples`` rows.
+
+    Decoding is split into demuxing and decoding the packets of the first
+    ``clip_duration_in_seconds``, converting the frames to RGB at full
+    resolution, and resizing and cropping them. Tokenizers are only timed
+    when ``transforms``, as returned by default_transforms, are given.
+
+    Returns:
+        dict[str, dict[str, float]]: A latency summary per stage.
+    """
+    timings = defaultdict(list)
+    image_transforms, text_transforms, audio_transforms, _ = (
+        transforms if transforms is not None else (None,) * 4
+    )
+
+    raw_dataset = dataset.with_format(None)
+    for row_idx in range(min(num_samples, len(raw_dataset))):
+        row = _timed(timings, "arrow_read", raw_dataset.__getitem__, row_idx)
+
+        container = _timed(
+            timings,
+            "container_open",
+            av.open,
+            io.BytesIO(row["youtube_video_content"]),
+        )
+        video_stream = container.streams.video[0]
+
+        def decode_video():
+            frames = []
+            for frame in container.decode(video_stream):
+                if frame.time is not None and (
+                    frame.time > clip_duration_in_seconds
+                ):
+                    break
+                frames.append(frame)
+            return frames
+
+        video_frames = _timed(timings, "decode", decode_video)
+        video_frames = _timed(
+            timings,
+            "colour_conversion",
+            lambda: np.stack(
+                [frame.to_ndarray(format="rgb24") for frame in video_frames]
+            ),
+        )
+        video_frames = _timed(
+            timings,
+            "resize",
+            get_video_tensors,
+            torch.from_numpy(video_frames),
+            image_size,
+            keep_uint8=True,
+        )
+
+        container.seek(0)
+        audio_stream = container.streams.audio[0]
+        audio = []
+        for frame in container.decode(audio_stream):
+            if (
+                frame.time is not None
+                and frame.time > clip_duration_in_seconds
+            ):
+                break
+            audio.append(frame.to_ndarray()[0])
+        audio = torch.from_numpy(np.concatenate(audio))
+        audio = _timed(
+            timings,
+            "audio_resample",
+            extract_audio,
+            num_audio_frames,
+            audio,
+            source_sample_rate=audio_stream.rate,
+        )
+        container.close()
+
+        _timed(
+            timings,
+            "subtitle_parse",
+            build_subtitle_index,
+            row["youtube_subtitle_text"],
+        )
+
+        if transforms is not None:
+            _timed(
+                timings,
+                "text_tokenizer",
+                text_transforms,
+                row["youtube_title_text"],
+            )
+            _timed(
+                timings,
+                "image_tokenizer",
+                image_transforms,
+                list(video_frames),
+            )
+            _timed(timings, "audio_tokenizer", audio_transforms, [audio])
+
+    return {
+        stage: summarise_latencies(timings[stage])
+        for stage in STAGES
+        if stage in timings
+    }
+
+
+def benchmark_import_time(
+    module: str = "tali.data",
+    num_repeats: int = 5,
+    max_seconds: float | None = 1.0,
+    lazy_modules: tuple[str, ...] = LAZY_MODULES,
+) -> dict[str, float]:
+    """Times ``import module`` in fresh interpreters.
+
+    Guards against heavy modules being imported eagerly again, by failing
+    when the import is slow or loads any of ``lazy_modules``.
+
+    Args:
+        module (str): The module to import.
+        num_repeats (int): Number of interpreters started.
+        max_seconds (float | None): Raise when the median import takes
+            longer, never when None.
+        lazy_modules (tuple[str, ...]): Raise when importing ``module``
+            loads any of these.
+
+    Returns:
+        dict[str, float]: The summarised import times in seconds.
+    """
+    script = (
+        "import sys, time; start = time.perf_counter(); "
+        f"import {module}; print(time.perf_counter() - start); "
+        f"print(*(name for name in {tuple(lazy_modules)!r} "
+        "if name in sys.modules))"
+    )
+    latencies = []
+    for _ in range(num_repeats):
+        elapsed, loaded_modules = subprocess.run(
+            [sys.executable, "-c", script],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout.splitlines()[-2:]
+        if loaded_modules:
+            raise RuntimeError(
+                f"Importing {module} loaded {loaded_modules}, which should "
+                "only be imported on first use"
+            )
+        latencies.append(float(elapsed))
+    summary = summarise_latencies(latencies)
+    if max_seconds is not None and summary["p50"] > max_seconds:
+        raise RuntimeError(
+            f"Importing {module} took {summary['p50']:.2f}s, "
+            f"more than {max_seconds:.2f}s"
+        )
+    return summary
+
+
+def run_benchmark(
+    dataset_path: pathlib.Path | str | None = None,
+    output_path: pathlib.Path | str | None = None,
+    num_workers_list: tuple[int, ...] = (0, 2),
+    batch_size_list: tuple[int, ...] = (4, 8),
+    modality_list_names: tuple[str, ...] = tuple(BENCHMARK_MODALITY_LISTS),
+    num_batches: int = 8,
+    num_stage_samples: int = 16,
+    num_synthetic_rows: int = 32,
+    use_default_transforms: bool = False,
+    config_overrides: dict | None = None,
+    max_import_seconds: float | None = 1.0,
+) -> dict:
+    """Sweeps DataLoader settings over a TALI split and times each stage.
+
+    Runs offline on a synthetic parquet of generated MP4s when no
+    ``dataset_path`` is given.
+
+    Args:
+        dataset_path (pathlib.Path | str | None): Directory of TALI parquet
+            shards, a synthetic one is written when None.
+        output_path (pathlib.Path | str | None): Where to write the JSON.
+        num_workers_list (tuple[int, ...]): DataLoader workers to sweep.
+        batch_size_list (tuple[int, ...]): Batch sizes to sweep.
+        modality_list_names (tuple[str, ...]): Keys of
+            BENCHMARK_MODALITY_LISTS to sweep.
+        num_batches (int): Batches timed per setting.
+        num_stage_samples (int): Rows timed per stage.
+        num_synthetic_rows (int): Rows of the synthetic dataset, see
+            tali.synthetic.
+        use_default_transforms (bool): Tokenize with default_transforms,
+            which downloads the CLIP and Whisper processors.
+        config_overrides (dict | None): Extra TALIBaseTransformConfig
+            fields, e.g. ``{"collate_batches": True}``.
+        max_import_seconds (float | None): Fail when importing tali.data
+            takes longer, see benchmark_import_time.
+
+    Returns:
+        dict: The environment, the import time, the per-stage and the
+            DataLoader results.
+    """
+    with tempfile.TemporaryDirectory() as temp_dir:
+        temp_dir = pathlib.Path(temp_dir)
+        if dataset_path is None:
+            dataset_path = write_synthetic_dataset(
+                temp_dir / "data",
+                SyntheticDatasetConfig(
+                    num_rows=num_synthetic_rows,
+                    splits=("train",),
+                    width=320,
+                    height=180,
+                    fps=25,
+                    duration_in_seconds=4.0,
+                    duration_jitter_in_seconds=2.0,
+                ),
+            )
+        dataset = load_dataset_from_parquet(
+            dataset_path=dataset_path,
+            dataset_cache_path=temp_dir / "cache",
+        )["train"]
+
+        transforms = default_transforms() if use_default_transforms else None
+        (
+            image_transforms,
+            text_transforms,
+            audio_transforms,
+            video_transforms,
+        ) = (
+            transforms if transforms is not None else (None,) * 4
+        )
+        results = {
+            "environment": {
+                "python": platform.python_version(),
+                "torch": torch.__version__,
+                "av": av.__version__,
+                "num_rows": len(dataset),
+            },
+            "import_time": benchmark_import_time(
+                max_seconds=max_import_seconds
+            ),
+            "stages": benchmark_stages(
+                dataset, num_samples=num_stage_samples, transforms=transforms
+            ),
+            "dataloader": [],
+        }
+
+        for modality_list_name in modality_list_names:
+            transform = TALIBaseTransform(
+                cache_dir=temp_dir,
+                text_tokenizer=text_transforms,
+                image_tokenizer=image_transforms,
+                audio_tokenizer=audio_transforms,
+                video_tokenizer=video_transforms,
+                config=TALIBaseTransformConfig(
+                    root_filepath=temp_dir,
+                    modality_list=BENCHMARK_MODALITY_LISTS[modality_list_name],
+                    **(config_overrides or {}),
+                ),
+            )
+            for num_workers in num_workers_list:
+                for batch_size in batch_size_list:
+                    results["dataloader"].append(
+                        {
+                            "modality_list": modality_list_name,
+                            "num_workers": num_workers,
+                            "batch_size": batch_size,
+                            **benchmark_dataloader(
+                                dataset,
+                                transform,
+                                batch_size=batch_size,
+                                num_workers=num_workers,
+                                num_batches=num_batches,
+                            ),
+                        }
+                    )
+
+    if output_path is not None:
+        with open(output_path, "w") as f:
+            json.dump(results, f, indent=2)
+
+    return results
+
+
+if __name__ == "__main__":
+    import fire
+
+    fire.Fire(run_benchmark)
@@ -0,0 +1,251 @@
+from __future__ import annotations
+
+import json
+import os
+import pathlib
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any
+
+import numpy as np
+import PIL.Image
+
+from tali.utils import lazy_import
+
+torch = lazy_import("torch")
+
+CLIP_CACHE_METADATA_FILENAME = "metadata.json"
+CLIP_CACHE_INDEX_FILENAME = "index.npy"
+
+
+class ClipCacheWriter:
+    """Writes decoded clips into fixed-shape, memory-mapped ``.npy`` shards.
+
+    Every modality of a clip (``video``, ``image``, ``audio``) goes to its
+    own shard file, e.g. ``video-00003.npy`` holding ``(shard_size, T, C, H,
+    W)`` uint8 frames. Shards are allocated when their first clip arrives,
+    with shapes and dtypes taken from that clip. ``index.npy`` maps every
+    ``item_idx`` to its ``(shard, row)``.
+
+    Args:
+        root (pathlib.Path): Directory to write the shards to.
+        num_items (int): Total number of clips that will be written.
+        metadata (dict): Settings the clips were decoded with, checked by
+            readers before they serve clips.
+        shard_size (int): Number of clips per shard.
+    """
+
+    def __init__(
+        self,
+        root: pathlib.Path,
+        num_items: int,
+        metadata: dict,
+        shard_size: int = 1024,
+    ):
+        self.root = pathlib.Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.num_items = num_items
+        self.metadata = metadata
+        self.shard_size = shard_size
+        self.index = []
+        self.shards = {}
+
+    def _shard(self, name: str, shard_idx: int, value: torch.Tensor):
+        if (name, shard_idx) not in self.shards:
+            num_rows = min(
+                self.shard_size, self.num_items - shard_idx * self.shard_size
+            )
+            self.shards[(name, shard_idx)] = np.lib.format.open_memmap(
+                self.root / f"{name}-{shard_idx:05d}.npy",
+                mode="w+",
+                dtype=np.asarray(value).dtype,
+                shape=(num_rows, *np.shape(value)),
+            )
+        return self.shards[(name, shard_idx)]
+
+    def write(self, item_idx: int, clip: dict[str, torch.Tensor | float]):
+        shard_idx, row = divmod(len(self.index), self.shard_size)
+        for name, value in clip.items():
+            self._shard(name, shard_idx, value)[row] = np.asarray(value)
+        self.index.append((item_idx, shard_idx, row))
+
+        if row == self.shard_size - 1:
+            self._flush(shard_idx)
+
+    def _flush(self, shard_idx: int):
+        for key in [key for key in self.shards if key[1] == shard_idx]:
+            self.shards.pop(key).flush()
+
+    def close(self):
+        for shard_idx in {shard_idx for _, shard_idx in self.shards}:
+            self._flush(shard_idx)
+        np.save(
+            self.root / CLIP_CACHE_INDEX_FILENAME,
+            np.asarray(self.index, dtype=np.int64).reshape(-1, 3),
+        )
+        with open(self.root / CLIP_CACHE_METADATA_FILENAME, "w") as f:
+            json.dump(self.metadata, f)
+
+
+class ClipCache:
+    """Reads clips written by ClipCacheWriter without copying them.
+
+    Every subdirectory of ``root`` holding a ``metadata.json`` (typically
+    one per split) is indexed. Shards are memory-mapped copy-on-write, so a
+    clip is only paged in from disk when it is read and tensors can be
+    built over the mapping directly.
+
+    Args:
+        root (pathlib.Path): Directory holding one cache per subdirectory.
+    """
+
+    def __init__(self, root: pathlib.Path):
+        self.root = pathlib.Path(root)
+        self.metadata = None
+        self.index = {}
+        self.directories = []
+        self.shards = {}
+
+        for metadata_path in sorted(
+            self.root.glob(f"*/{CLIP_CACHE_METADATA_FILENAME}")
+        ):
+            with open(metadata_path) as f:
+                metadata = json.load(f)
+            if self.metadata is not None and metadata != self.metadata:
+                raise ValueError(
+                    f"Clip cache {metadata_path.parent} was built with "
+                    f"{metadata}, but {self.metadata} was expected"
+                )
+            self.metadata = metadata
+
+            directory_idx = len(self.directories)
+            self.directories.append(metadata_path.parent)
+            index = np.load(metadata_path.parent / CLIP_CACHE_INDEX_FILENAME)
+            for item_idx, shard_idx, row in index.tolist():
+                self.index[item_idx] = (directory_idx, shard_idx, row)
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, item_idx: int):
+        return int(item_idx) in self.index
+
+    def _shard(self, directory_idx: int, name: str, shard_idx: int):
+        key = (directory_idx, name, shard_idx)
+        if key not in self.shards:
+            path = (
+                self.directories[directory_idx] / f"{name}-{shard_idx:05d}.npy"
+            )
+            self.shards[key] = (
+                np.load(path, mmap_mode="c") if path.exists() else None
+            )
+        return self.shards[key]
+
+    def get(self, item_idx: int) -> dict[str, torch.Tensor] | None:
+        if int(item_idx) not in self.index:
+            return None
+
+        directory_idx, shard_idx, row = self.index[int(item_idx)]
+        clip = {}
+        for name in ("video", "image", "audio", "starting_second"):
+            shard = self._shard(directory_idx, name, shard_idx)
+            if shard is not None:
+                clip[name] = torch.from_numpy(np.asarray(shard[row]))
+        return clip
+
+
+def size_in_bytes(value: Any) -> int:
+    """Approximate memory held by tensors, arrays, images and strings,
+    summed over nested dicts, lists and tuples."""
+    if isinstance(value, torch.Tensor):
+        return value.nbytes
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, PIL.Image.Image):
+        return value.width * value.height * len(value.getbands())
+    if isinstance(value, dict):
+        return sum(size_in_bytes(item) for item in value.values())
+    if isinstance(value, list | tuple):
+        return sum(size_in_bytes(item) for item in value)
+    if isinstance(value, str | bytes):
+        return len(value)
+    return sys.getsizeof(value)
+
+
+def _is_tensor_tree(value: Any) -> bool:
+    if isinstance(value, dict):
+        return all(_is_tensor_tree(item) for item in value.values())
+    if isinstance(value, list | tuple):
+        return all(_is_tensor_tree(item) for item in value)
+    return isinstance(value, torch.Tensor | str | int | float)
+
+
+class LRUCache:
+    """An in-memory cache with a byte budget and least recently used
+    eviction, optionally backed by a directory shared between processes.
+
+    Entries over ``max_size_in_bytes`` are not kept in memory. With
+    ``disk_path``, entries made of tensors, strings and numbers are also
+    written there, one file per key, and read back on memory misses, so
+    DataLoader workers reuse each other's entries. The disk tier is not
+    evicted.
+
+    Args:
+        max_size_in_bytes (int): Memory budget of the cache.
+        disk_path (pathlib.Path | None): Directory of the disk tier.
+    """
+
+    def __init__(
+        self, max_size_in_bytes: int, disk_path: pathlib.Path | None = None
+    ):
+        self.max_size_in_bytes = max_size_in_bytes
+        self.disk_path = pathlib.Path(disk_path) if disk_path else None
+        if self.disk_path is not None:
+            self.disk_path.mkdir(parents=True, exist_ok=True)
+        self.entries = OrderedDict()
+        self.size_in_bytes = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _disk_file(self, key: str) -> pathlib.Path:
+        return self.disk_path / f"{key}.pt"
+
+    def get(self, key: str) -> Any | None:
+        with self._lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                return self.entries[key][0]
+
+        if self.disk_path is None or not self._disk_file(key).exists():
+            return None
+        value = torch.load(self._disk_file(key), weights_only=True)
+        self._put_in_memory(key, value)
+        return value
+
+    def _put_in_memory(self, key: str, value: Any):
+        value_size = size_in_bytes(value)
+        if value_size > self.max_size_in_bytes:
+            return
+        with self._lock:
+            if key in self.entries:
+                self.size_in_bytes -= self.entries.pop(key)[1]
+            self.entries[key] = (value, value_size)
+            self.size_in_bytes += value_size
+            while self.size_in_bytes > self.max_size_in_bytes:
+                _, (_, evicted_size) = self.entries.popitem(last=False)
+                self.size_in_bytes -= evicted_size
+
+    def put(self, key: str, value: Any):
+        self._put_in_memory(key, value)
+        if (
+            self.disk_path is not None
+            and _is_tensor_tree(value)
+            and not self._disk_file(key).exists()
+        ):
+            # Write then rename, so readers never see a partial file
+            temp_file = self.disk_path / f".{key}.{os.getpid()}.tmp"
+            torch.save(value, temp_file)
+            os.replace(temp_file, self._disk_file(key))
@@ -1,29 +1,56 @@
+from __future__ import annotations
+
+import bisect
+import contextlib
+import functools
+import hashlib
+import io
+import json
 import logging
 import multiprocessing as mp
 import pathlib
 from collections import defaultdict
 from collections.abc import Callable
-from dataclasses import dataclass
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, replace
 from enum import Enum
 from math import floor
 from typing import Any, Optional
 
-import datasets
 import numpy as np
-import PIL
-import torch
-import torchaudio.transforms as TA
+import PIL.Image
 import yaml
-from datasets import Features, Image, Sequence, Value
 from rich import print
-from rich.traceback import install
-from torchvision.transforms import CenterCrop, Compose, Resize
-from tqdm import tqdm
 import random
-from tali.frames import FrameSelectionMethod, extract_frames_pyav
-from tali.utils import enrichen_logger
-
-install()
+from tali.audio import whisper_log_mel_spectrogram
+from tali.cache import ClipCache, ClipCacheWriter, LRUCache
+from tali.distributed import (
+    assign_shards_to_rank,
+    get_rank_and_world_size,
+    local_main_process_first,
+    max_num_rows_across_ranks,
+    pad_dataset_to_num_rows,
+)
+from tali.frames import (
+    FrameSelectionMethod,
+    VideoDecodingMode,
+    extract_clip_pyav,
+    probe_clip_window,
+    select_clip_window,
+)
+from tali.profiling import (
+    ProfilingSink,
+    enable_profiling,
+    profile_stage,
+    record_count,
+)
+from tali.utils import enrichen_logger, lazy_import
+
+# Imported on first use, see lazy_import
+datasets = lazy_import("datasets")
+torch = lazy_import("torch")
+TA = lazy_import("torchaudio.transforms")
+TV = lazy_import("torchvision.transforms")
 
 logger = logging.getLogger(__name__)
 logger = enrichen_logger(logger)
@@ -53,6 +80,11 @@ class VideoFramesFormat(Enum):
     TENSOR = "TENSOR"
 
 
+class DecodeExecutorTypes(Enum):
+    thread = "thread"
+    process = "process"
+
+
 @dataclass
 class SubModality:
     parent: ModalityTypes
@@ -96,6 +128,13 @@ class SubModalityTypes(Enum):
     )
 
 
+YOUTUBE_CLIP_SUB_MODALITIES = [
+    SubModalityTypes.youtube_content_video,
+    SubModalityTypes.youtube_content_audio,
+    SubModalityTypes.youtube_random_video_frame,
+]
+
+
 class TALIKeys(Enum):
     image = "image"
     image_url = "image_url"
@@ -107,9 +146,16 @@ class TALIKeys(Enum):
     youtube_video_content = "youtube_video_content"
     youtube_video_starting_time = "youtube_video_starting_time"
     youtube_subtitle_text = "youtube_subtitle_text"
+    youtube_subtitle_timestamps = "youtube_subtitle_timestamps"
+    youtube_subtitle_indexed_text = "youtube_subtitle_indexed_text"
+    youtube_subtitle_offsets = "youtube_subtitle_offsets"
     youtube_video_size = "youtube_video_size"
     youtube_video_file_path = "youtube_video_file_path"
     wikipedia_caption_text = "wikipedia_caption_text"
+    youtube_title_text_tokens = "youtube_title_text_tokens"
+    youtube_description_text_tokens = "youtube_description_text_tokens"
+    wikipedia_caption_text_tokens = "wikipedia_caption_text_tokens"
+    wikipedia_entry_tokens = "wikipedia_entry_tokens"
 
 
 @dataclass
@@ -139,6 +185,67 @@ class TALIBaseTransformConfig:
     return_all_caption_languages: bool = False
     video_frame_duration: int = 30
     video_frames_format: str = VideoFramesFormat.TENSOR.value
+    video_frames_uint8: bool = False
+    resample_audio_in_decoder: bool = False
+    collate_batches: bool = False
+    num_decode_workers: int = 0
+    # "process" falls back to threads inside DataLoader workers, daemonic
+    # processes can not start a process pool
+    decode_executor: str = DecodeExecutorTypes.thread.value
+    use_clip_cache: bool = False
+    profile: bool = False
+    video_decoding_mode: str = VideoDecodingMode.ALL_FRAMES
+    # Pads pretokenized text in collated batches, CLIP's <|endoftext|>
+    text_padding_value: int = 49407
+    wikipedia_cache_size_in_bytes: int = 0
+    use_wikipedia_disk_cache: bool = False
+    # Names the tokenizers in the disk cache's path, needed when they are
+    # not tagged with a tokenizer_id like those of default_transforms
+    wikipedia_cache_key: str | None = None
+
+
+def build_subtitle_index(
+    subtitle_dict: str,
+) -> tuple[list[float], str, list[int]]:
+    """Parses a YAML subtitle blob into a compact, sorted subtitle index.
+
+    Args:
+        subtitle_dict (str): YAML mapping of subtitle timestamps to text.
+
+    Returns:
+        A ``(timestamps, text, offsets)`` tuple. ``timestamps`` are sorted,
+        ``text`` is every subtitle followed by a space, and subtitle ``i``
+        spans ``text[offsets[i]:offsets[i + 1]]``.
+    """
+    subtitle_dict = yaml.load(
+        subtitle_dict, Loader=getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+    )
+    subtitle_dict = {
+        float(key): "".join(value)
+        for key, value in (subtitle_dict or {}).items()
+    }
+    timestamps = sorted(subtitle_dict)
+    subtitle_texts = [
+        subtitle_dict[timestamp] + " " for timestamp in timestamps
+    ]
+    offsets = np.cumsum(
+        [0] + [len(subtitle_text) for subtitle_text in subtitle_texts]
+    ).tolist()
+    return timestamps, "".join(subtitle_texts), offsets
+
+
+def select_subtitles_from_index(
+    subtitle_timestamps: list[float],
+    subtitle_text: str,
+    subtitle_offsets: list[int],
+    starting_timestamp: float,
+    ending_timestamp: float,
+) -> str:
+    first = bisect.bisect_left(subtitle_timestamps, starting_timestamp)
+    last = bisect.bisect_right(subtitle_timestamps, ending_timestamp)
+    if first >= last:
+        return ""
+    return subtitle_text[subtitle_offsets[first] : subtitle_offsets[last]]
 
 
 def select_subtitles_between_timestamps(
@@ -146,59 +253,322 @@ def select_subtitles_between_timestamps(
     starting_timestamp: float,
     ending_timestamp: float,
 ):
-    subtitle_dict = yaml.safe_load(subtitle_dict)
-    subtitle_dict = {float(key): value for key, value in subtitle_dict.items()}
-    subtitle_dict = dict(sorted(subtitle_dict.items(), key=lambda x: x[0]))
-    selected_subtitles = ""
-    for subtitle_timestamp, subtitle_text in subtitle_dict.items():
-        subtitle_timestamp = float(subtitle_timestamp)
-        if (
-            float(subtitle_timestamp) >= starting_timestamp
-            and float(subtitle_timestamp) <= ending_timestamp
-        ):
-            subtitle_text = "".join(subtitle_text)
-            selected_subtitles += subtitle_text + " "
+    return select_subtitles_from_index(
+        *build_subtitle_index(subtitle_dict),
+        starting_timestamp=starting_timestamp,
+        ending_timestamp=ending_timestamp,
+    )
+
+
+def _index_subtitles_batch(subtitle_texts: list[str]) -> dict[str, list]:
+    subtitle_indices = [
+        build_subtitle_index(subtitle_text) for subtitle_text in subtitle_texts
+    ]
+    return {
+        TALIKeys.youtube_subtitle_timestamps.value: [
+            timestamps for timestamps, _, _ in subtitle_indices
+        ],
+        TALIKeys.youtube_subtitle_indexed_text.value: [
+            text for _, text, _ in subtitle_indices
+        ],
+        TALIKeys.youtube_subtitle_offsets.value: [
+            np.asarray(offsets, dtype=np.int32)
+            for _, _, offsets in subtitle_indices
+        ],
+    }
+
+
+def index_subtitles(
+    dataset: datasets.Dataset | datasets.DatasetDict,
+    num_proc: int | None = None,
+    batch_size: int = 1000,
+):
+    """Adds pre-parsed subtitle index columns to a TALI dataset.
+
+    The YAML in ``youtube_subtitle_text`` is parsed once here, and
+    TALIBaseTransform picks the index columns up automatically, turning
+    per-sample subtitle windowing into a binary search and a slice.
+
+    Args:
+        dataset: A TALI Dataset or DatasetDict.
+        num_proc (int | None): Number of processes to index with.
+        batch_size (int): Number of rows per map batch.
+
+    Returns:
+        The dataset with ``youtube_subtitle_timestamps``,
+        ``youtube_subtitle_indexed_text`` and ``youtube_subtitle_offsets``
+        columns.
+    """
+    return dataset.map(
+        _index_subtitles_batch,
+        batched=True,
+        batch_size=batch_size,
+        input_columns=TALIKeys.youtube_subtitle_text.value,
+        num_proc=num_proc,
+        desc="Indexing subtitles",
+    )
+
+
+def wikipedia_language_positions(wikipedia_features: dict) -> dict[str, int]:
+    """Maps every language of a row's ``wit_features`` to the position of
+    its first entry, in order of appearance."""
+    language_positions = {}
+    for language_idx, language in enumerate(wikipedia_features["language"]):
+        language_positions.setdefault(language, language_idx)
+    return language_positions
+
+
+def wikipedia_text_at(
+    wikipedia_features: dict, language_idx: int
+) -> dict[str, str]:
+    """The non-empty WIKIPEDIA_ENTRY_KEYS of one language of a row."""
+    return {
+        key: wikipedia_features[key][language_idx]
+        for key in WIKIPEDIA_ENTRY_KEYS
+        if wikipedia_features[key][language_idx] is not None
+    }
+
+
+def wikipedia_text_by_language(
+    wikipedia_features: dict,
+) -> dict[str, dict[str, str]]:
+    """The non-empty WIKIPEDIA_ENTRY_KEYS of every language of a row's
+    ``wit_features``."""
+    return {
+        language: wikipedia_text_at(wikipedia_features, language_idx)
+        for language, language_idx in wikipedia_language_positions(
+            wikipedia_features
+        ).items()
+    }
+
+
+def wikipedia_caption_string(wit_text: dict[str, str]) -> str:
+    return "\n".join([f"{key}: {value}" for key, value in wit_text.items()])
+
+
+def _token_ids(text_tokenizer: Callable, text: str) -> np.ndarray:
+    return np.asarray(text_tokenizer(text), dtype=np.int32).reshape(-1)
+
+
+def _pretokenize_text_batch(
+    batch: dict[str, list],
+    text_tokenizer: Callable,
+    all_caption_languages: bool,
+) -> dict[str, list]:
+    output = {
+        TALIKeys.youtube_title_text_tokens.value: [
+            _token_ids(text_tokenizer, text)
+            for text in batch[TALIKeys.youtube_title_text.value]
+        ],
+        TALIKeys.youtube_description_text_tokens.value: [
+            _token_ids(text_tokenizer, text)
+            for text in batch[TALIKeys.youtube_description_text.value]
+        ],
+        TALIKeys.wikipedia_caption_text_tokens.value: [],
+    }
+    if all_caption_languages:
+        output[TALIKeys.wikipedia_entry_tokens.value] = []
+
+    for wikipedia_features in batch[TALIKeys.wit_features.value]:
+        # One entry per position of wit_features["language"], repeated
+        # languages reuse the text of their first position
+        wikipedia_text = wikipedia_text_by_language(wikipedia_features)
+        output[TALIKeys.wikipedia_caption_text_tokens.value].append(
+            [
+                _token_ids(
+                    text_tokenizer,
+                    wikipedia_caption_string(wikipedia_text[language]),
+                )
+                for language in wikipedia_features["language"]
+            ]
+        )
+        if all_caption_languages:
+            output[TALIKeys.wikipedia_entry_tokens.value].append(
+                {
+                    key: [
+                        (
+                            _token_ids(
+                                text_tokenizer, wikipedia_text[language][key]
+                            )
+                            if key in wikipedia_text[language]
+                            else None
+                        )
+                        for language in wikipedia_features["language"]
+                    ]
+                    for key in WIKIPEDIA_ENTRY_KEYS
+                }
+            )
+    return output
+
+
+def pretokenize_text(
+    dataset: datasets.Dataset | datasets.DatasetDict,
+    text_tokenizer: Callable,
+    all_caption_languages: bool = False,
+    num_proc: int | None = None,
+    batch_size: int = 1000,
+):
+    """Adds int32 token id columns for the text that never changes.
+
+    YouTube titles and descriptions and the Wikipedia caption of every
+    language are tokenized once here and cached by ``datasets``.
+    TALIBaseTransform picks the token columns up automatically and then
+    only tokenizes the subtitle window, which depends on the clip.
+
+    Args:
+        dataset: A TALI Dataset or DatasetDict.
+        text_tokenizer (Callable): The ``text_tokenizer`` of the transform,
+            called on one string at a time.
+        all_caption_languages (bool): Also tokenize every Wikipedia entry
+            of every language, for ``return_all_caption_languages``.
+        num_proc (int | None): Number of processes to tokenize with.
+        batch_size (int): Number of rows per map batch.
+
+    Returns:
+        The dataset with ``youtube_title_text_tokens``,
+        ``youtube_description_text_tokens`` and
+        ``wikipedia_caption_text_tokens``, and with
+        ``all_caption_languages`` ``wikipedia_entry_tokens``, columns.
+    """
+    return dataset.map(
+        _pretokenize_text_batch,
+        batched=True,
+        batch_size=batch_size,
+        fn_kwargs=dict(
+            text_tokenizer=text_tokenizer,
+            all_caption_languages=all_caption_languages,
+        ),
+        num_proc=num_proc,
+        desc="Tokenizing text",
+    )
 
-    return selected_subtitles
+
+@functools.lru_cache
+def _video_crop_transform(image_size: int):
+    return TV.Compose(
+        [
+            TV.Resize(size=image_size, antialias=True),
+            TV.CenterCrop(size=(image_size, image_size)),
+        ]
+    )
 
 
-def get_video_tensors(video_frames, image_size):
+def get_video_tensors(video_frames, image_size, keep_uint8: bool = False):
     """Converts video frames into tensor format and applies transforms.
 
+    Frames stay uint8 through the resize and crop, and the resize is
+    skipped when the decoder already scaled the shorter side to
+    ``image_size``.
+
     Args:
-        video_frames: Frames extracted from a video.
+        video_frames: ``(T, H, W, C)`` uint8 frames extracted from a video.
         image_size (int): The size for each video frame.
+        keep_uint8 (bool): Return uint8 frames instead of floats in [0, 1].
 
     Returns:
-        Transformed video frames in tensor format.
+        Transformed ``(T, C, image_size, image_size)`` video frames.
     """
-    video_frames = video_frames.permute(0, 3, 1, 2).to(torch.float32)
-    # Replace pytorchvideo transforms with torchvision transforms
-    video_transform = Compose(
+    video_frames = video_frames.permute(0, 3, 1, 2)
+    if min(video_frames.shape[-2:]) == image_size:
+        video_frames = TV.CenterCrop(size=(image_size, image_size))(
+            video_frames
+        )
+    elif video_frames.shape[0] > 0:
+        video_frames = _video_crop_transform(image_size)(video_frames)
+    else:
+        video_frames = video_frames.new_zeros(
+            (0, video_frames.shape[1], image_size, image_size)
+        )
+
+    if keep_uint8:
+        return video_frames.contiguous()
+    return video_frames.to(torch.float32) / 255.0
+
+
+@functools.lru_cache
+def _clip_crop_transform(
+    shortest_edge: int, crop_height: int, crop_width: int
+):
+    return TV.Compose(
         [
-            Resize(size=image_size, antialias=True),
-            CenterCrop(size=(image_size, image_size)),
+            TV.Resize(
+                size=shortest_edge,
+                interpolation=TV.InterpolationMode.BICUBIC,
+                antialias=True,
+            ),
+            TV.CenterCrop(size=(crop_height, crop_width)),
         ]
     )
-    # Apply transforms to each frame
-    B, C, H, W = video_frames.shape
-    video_frames = video_frames.view(
-        -1, C, H, W
-    )  # Combine batch and time dimensions
-    video_frames = video_transform(video_frames)
-    video_frames = video_frames.view(
-        B, C, image_size, image_size
-    )  # Restore batch dimension
-    return video_frames / 255.0
+
+
+def clip_pixel_values(frames: torch.Tensor, image_processor) -> torch.Tensor:
+    """Normalises frames the way a CLIP image processor does, on tensors.
+
+    The bicubic resize of the shorter side, the center crop and the mean
+    and std normalisation run once over all frames, and the resize is
+    skipped when frames already have the processor's size, as decoded
+    TALI frames do.
+
+    Args:
+        frames (torch.Tensor): uint8 ``(C, H, W)`` or ``(T, C, H, W)``
+            frames, or floats in [0, 1].
+        image_processor: The ``image_processor`` of a ``CLIPProcessor``,
+            which provides the sizes, mean and std.
+
+    Returns:
+        ``(T, C, crop_height, crop_width)`` float32 ``pixel_values``, with
+        ``T`` 1 for a single frame.
+    """
+    if frames.dim() == 3:
+        frames = frames.unsqueeze(0)
+
+    shortest_edge = image_processor.size["shortest_edge"]
+    crop_height = image_processor.crop_size["height"]
+    crop_width = image_processor.crop_size["width"]
+    if min(frames.shape[-2:]) != shortest_edge and frames.shape[0] > 0:
+        frames = _clip_crop_transform(shortest_edge, crop_height, crop_width)(
+            frames
+        )
+    else:
+        frames = TV.CenterCrop(size=(crop_height, crop_width))(frames)
+
+    # Fold the rescale into the normalisation, one multiply-add per pixel
+    rescale_factor = (
+        image_processor.rescale_factor if frames.dtype == torch.uint8 else 1.0
+    )
+    std = torch.tensor(image_processor.image_std).view(-1, 1, 1)
+    mean = torch.tensor(image_processor.image_mean).view(-1, 1, 1)
+    return torch.addcmul(
+        -mean / std, frames.to(torch.float32), rescale_factor / std
+    )
 
 
 def convert_to_pil(image):
     image = image.numpy().transpose(1, 2, 0)
-    image = (image * 255).astype(np.uint8)
+    if image.dtype != np.uint8:
+        image = (image * 255).astype(np.uint8)
     image = PIL.Image.fromarray(image)
     return image
 
 
+def format_video_frames(
+    frames: torch.Tensor,
+    video_frame_format: str | VideoFramesFormat,
+    keep_uint8: bool = False,
+):
+    """Converts uint8 ``(C, H, W)`` or ``(T, C, H, W)`` frames into the
+    requested VideoFramesFormat: PIL images, or float tensors in [0, 1]
+    unless ``keep_uint8`` is set."""
+    if VideoFramesFormat(video_frame_format) == VideoFramesFormat.PIL:
+        if frames.dim() == 3:
+            return convert_to_pil(frames)
+        return [convert_to_pil(frame) for frame in frames]
+
+    if keep_uint8:
+        return frames
+    return frames.to(torch.float32) / 255.0
+
+
 def videoclip_to_video_audio_tensors(
     video_data: pathlib.Path | bytes | str,
     rng: np.random.Generator | None = None,
@@ -211,9 +581,18 @@ def videoclip_to_video_audio_tensors(
     num_audio_frames: int = 1 * 16000,
     num_video_frames: int = 10,
     video_frame_format: str = VideoFramesFormat.TENSOR,
+    keep_uint8: bool = False,
+    audio_sample_rate: int = 16000,
+    resample_audio_in_decoder: bool = False,
+    video_decoding_mode: str = VideoDecodingMode.ALL_FRAMES,
+    clip_duration_in_seconds: float | None = None,
 ):
     """Extracts frames from a video clip and transforms them into tensors.
 
+    The container is opened and demuxed once for all requested modalities,
+    and frames are scaled during decode and kept uint8 until the output
+    format is applied.
+
     Args:
         video_path (pathlib.Path): The path to the video file.
         rng (np.random.Generator): A random number generator.
@@ -225,33 +604,57 @@ def videoclip_to_video_audio_tensors(
         ending_second (Optional[int]): The ending time of the clip in seconds.
         num_audio_frames (int): The number of audio frames to extract.
         num_video_frames (int): The number of video frames to extract.
+        video_frame_format (str): One of VideoFramesFormat.
+        keep_uint8 (bool): Return TENSOR frames as uint8 rather than floats
+            in [0, 1].
+        audio_sample_rate (int): The sample rate of the returned audio.
+        resample_audio_in_decoder (bool): Resample and downmix audio with
+            PyAV while decoding instead of with torchaudio afterwards.
+        video_decoding_mode (str): One of VideoDecodingMode, trading frame
+            accuracy for decoding speed.
+        clip_duration_in_seconds (Optional[float]): Decode only a window of
+            this length, drawn with ``rng`` between ``starting_second`` and
+            ``ending_second``.
 
     Returns:
         A dictionary containing video frames, image frames, and/or audio frames
-        in tensor format.
+        in tensor format, and the ``starting_second`` of the decoded window.
     """
     output = {}
-    video = image = audio = None
+    video_frame_format = VideoFramesFormat(video_frame_format)
 
     if rng is None:
         rng = np.random.default_rng()
 
-    if return_video:
-        video = extract_frames_pyav(
+    if isinstance(video_data, bytes):
+        record_count("video_bytes_read", len(video_data))
+
+    with profile_stage("clip_decode"):
+        clip = extract_clip_pyav(
             video_data=video_data,
             starting_second=starting_second,
             ending_second=ending_second,
-            num_frames=num_video_frames + (1 if return_image else 0),
             rng=rng,
-            modality="video",
+            num_video_frames=num_video_frames,
+            audio_duration_in_seconds=num_audio_frames / audio_sample_rate,
+            return_video=return_video,
+            return_image=return_image,
+            return_audio=return_audio,
             frame_selection_method=FrameSelectionMethod.RANDOM,
+            resize_shorter_side_to=image_size,
+            audio_sample_rate=(
+                audio_sample_rate if resample_audio_in_decoder else None
+            ),
+            decoding_mode=video_decoding_mode,
+            clip_duration_in_seconds=clip_duration_in_seconds,
         )
+    output["starting_second"] = clip["starting_second"]
 
-        video = get_video_tensors(video, image_size)
-
-        if return_image:
-            image = video[0]
-            video = video[1:]
+    if return_video:
+        with profile_stage("resize"):
+            video = get_video_tensors(
+                clip["video"], image_size, keep_uint8=True
+            )
 
         if video.shape[0] < num_video_frames:
             video = torch.cat(
@@ -262,84 +665,66 @@ def videoclip_to_video_audio_tensors(
                         video.shape[1],
                         video.shape[2],
                         video.shape[3],
+                        dtype=video.dtype,
                     ),
                 ],
                 dim=0,
             )
 
-        output["video"] = (
-            [convert_to_pil(frame) for frame in video]
-            if video_frame_format == VideoFramesFormat.PIL
-            else (
-                video
-                if video_frame_format == VideoFramesFormat.TENSOR
-                else None
-            )
+        output["video"] = format_video_frames(
+            video, video_frame_format, keep_uint8
         )
-        if output["video"] is None:
-            raise ValueError(
-                f"Unknown video frame format {video_frame_format}, "
-                f"must be one of {VideoFramesFormat.PIL} or "
-                f"{VideoFramesFormat.TENSOR}"
-            )
+        record_count("video_output_bytes", video.nbytes)
 
     if return_image:
-        if image is None:
-            image = extract_frames_pyav(
-                video_data=video_data,
-                starting_second=starting_second,
-                ending_second=ending_second,
-                num_frames=1,
-                rng=rng,
-                modality="video",
-                frame_selection_method=FrameSelectionMethod.RANDOM,
-                single_image_frame=True,
-            )
-            image = get_video_tensors(image, image_size)[0]
-
-        output["image"] = (
-            convert_to_pil(image)
-            if video_frame_format == VideoFramesFormat.PIL
-            else (
-                image
-                if video_frame_format == VideoFramesFormat.TENSOR
-                else None
+        with profile_stage("resize"):
+            image = get_video_tensors(
+                clip["image"], image_size, keep_uint8=True
             )
+        output["image"] = format_video_frames(
+            image[0], video_frame_format, keep_uint8
         )
 
-        if output["image"] is None:
-            raise ValueError(
-                f"Unknown video frame format {video_frame_format}, "
-                f"must be one of {VideoFramesFormat.PIL} or "
-                f"{VideoFramesFormat.TENSOR}"
-            )
-
     if return_audio:
-        audio = extract_frames_pyav(
-            video_data=video_data,
-            starting_second=starting_second,
-            ending_second=ending_second,
-            num_frames=44100 * num_audio_frames / 16000,
-            rng=rng,
-            modality="audio",
-            frame_selection_method=FrameSelectionMethod.SEQUENTIAL,
-        )[:, 0]
-
-        audio = extract_audio(num_audio_frames, audio)
+        with profile_stage("audio_resample"):
+            audio = extract_audio(
+                num_audio_frames,
+                clip["audio"][:, 0],
+                source_sample_rate=clip["audio_sample_rate"],
+                target_sample_rate=audio_sample_rate,
+            )
         output["audio"] = audio
+        record_count("audio_output_bytes", audio.nbytes)
 
     return output
 
 
-def extract_audio(num_audio_frames, audio_frames):
-    audio_duration_target = float(num_audio_frames) / 16000.0
-    source_sample_rate = 44100
-    target_sample_rate = 16000
-    audio_frames = audio_frames[: int(floor(44100 * audio_duration_target))]
-    resampler = TA.Resample(
-        source_sample_rate, target_sample_rate, dtype=audio_frames.dtype
+@functools.lru_cache
+def get_resampler(
+    source_sample_rate: int, target_sample_rate: int, dtype: torch.dtype
+):
+    """Returns a cached resampler, so its sinc kernel is built once per
+    process rather than once per sample."""
+    return TA.Resample(source_sample_rate, target_sample_rate, dtype=dtype)
+
+
+def extract_audio(
+    num_audio_frames,
+    audio_frames,
+    source_sample_rate: int = 44100,
+    target_sample_rate: int = 16000,
+):
+    audio_duration_target = float(num_audio_frames) / target_sample_rate
+    audio_frames = audio_frames[
+        : int(floor(source_sample_rate * audio_duration_target))
+    ]
+    audio = (
+        get_resampler(
+            source_sample_rate, target_sample_rate, audio_frames.dtype
+        )(audio_frames)
+        if source_sample_rate != target_sample_rate
+        else audio_frames
     )
-    audio = resampler(audio_frames)
     # audio_shape = audio.shape
 
     if audio.shape[0] < num_audio_frames:
@@ -352,71 +737,291 @@ def extract_audio(num_audio_frames, audio_frames):
             ],
             dim=0,
         )
-    return audio
+    return audio[:num_audio_frames]
+
+
+DATASET_SPLITS = ("train", "val", "test")
+
+
+def _split_of(path: str) -> str | None:
+    for split in DATASET_SPLITS:
+        if split in pathlib.Path(path).name:
+            return split
+    return None
+
+
+def list_dataset_shards(
+    dataset_name: str,
+    splits: list[str] | None = None,
+    revision: str | None = None,
+) -> dict[str, list[tuple[str, int]]]:
+    """Lists the parquet shards of a hub dataset without downloading them.
+
+    Args:
+        dataset_name (str): The dataset repository, e.g. ``Antreas/TALI``.
+        splits (list[str] | None): Splits to list, all of them when None.
+        revision (str | None): Commit to list, the latest when None.
+
+    Returns:
+        dict[str, list[tuple[str, int]]]: ``(path_in_repo, size_in_bytes)``
+            of every shard, sorted by path, per split.
+    """
+    import huggingface_hub as hf_hub
+
+    shards = defaultdict(list)
+    for entry in hf_hub.HfApi().list_repo_tree(
+        repo_id=dataset_name,
+        repo_type="dataset",
+        path_in_repo="data",
+        recursive=True,
+        revision=revision,
+    ):
+        if not isinstance(entry, hf_hub.hf_api.RepoFile):
+            continue
+        split = _split_of(entry.path)
+        if not entry.path.endswith(".parquet") or split is None:
+            continue
+        if splits is None or split in splits:
+            shards[split].append((entry.path, entry.size))
+
+    return {
+        split: sorted(split_shards) for split, split_shards in shards.items()
+    }
+
+
+def select_dataset_shards(
+    shards: dict[str, list[tuple[str, int]]],
+    num_shards: int | None = None,
+    shard_range: tuple[int, int] | None = None,
+    shard_fraction: float | None = None,
+    max_size_in_bytes: int | None = None,
+) -> dict[str, list[tuple[str, int]]]:
+    """Picks a subset of every split's shards.
+
+    The index range is applied first, then the fraction and the count, and
+    finally the size budget, which is shared by all splits and filled by
+    taking one shard from each split in turn so no split is starved.
+
+    Args:
+        shards (dict[str, list[tuple[str, int]]]): As list_dataset_shards.
+        num_shards (int | None): Keep at most this many shards per split.
+        shard_range (tuple[int, int] | None): Keep shards
+            ``[start, end)`` of every split.
+        shard_fraction (float | None): Keep this fraction of every split,
+            rounded up so that non-empty splits keep at least one shard.
+        max_size_in_bytes (int | None): Total download size to stay under.
+
+    Returns:
+        dict[str, list[tuple[str, int]]]: The selected shards per split.
+    """
+    selected = {}
+    for split, split_shards in shards.items():
+        if shard_range is not None:
+            split_shards = split_shards[shard_range[0] : shard_range[1]]
+        if shard_fraction is not None:
+            split_shards = split_shards[
+                : int(np.ceil(len(split_shards) * shard_fraction))
+            ]
+        if num_shards is not None:
+            split_shards = split_shards[:num_shards]
+        selected[split] = split_shards
+
+    if max_size_in_bytes is None:
+        return selected
+
+    budgeted = {split: [] for split in selected}
+    total_size = 0
+    for shard_idx in range(max(map(len, selected.values()), default=0)):
+        for split, split_shards in selected.items():
+            if shard_idx >= len(split_shards):
+                continue
+            path, size = split_shards[shard_idx]
+            if total_size + size <= max_size_in_bytes:
+                budgeted[split].append((path, size))
+                total_size += size
+    return budgeted
+
+
+def _shard_selection_patterns(
+    dataset_name: str,
+    splits: list[str] | None = None,
+    num_shards: int | None = None,
+    shard_range: tuple[int, int] | None = None,
+    shard_fraction: float | None = None,
+    max_size_in_bytes: int | None = None,
+    revision: str | None = None,
+) -> list[str] | None:
+    if all(
+        selection is None
+        for selection in (
+            splits,
+            num_shards,
+            shard_range,
+            shard_fraction,
+            max_size_in_bytes,
+        )
+    ):
+        return None
+
+    shards = select_dataset_shards(
+        list_dataset_shards(dataset_name, splits=splits, revision=revision),
+        num_shards=num_shards,
+        shard_range=shard_range,
+        shard_fraction=shard_fraction,
+        max_size_in_bytes=max_size_in_bytes,
+    )
+    return [
+        path for split_shards in shards.values() for path, _ in split_shards
+    ]
 
 
 def download_dataset_via_hub(
     dataset_name: str,
     dataset_download_path: pathlib.Path,
     num_download_workers: int = mp.cpu_count(),
+    splits: list[str] | None = None,
+    num_shards: int | None = None,
+    shard_range: tuple[int, int] | None = None,
+    shard_fraction: float | None = None,
+    max_size_in_bytes: int | None = None,
+    allow_patterns: list[str] | None = None,
 ):
+    """Downloads the dataset's parquet shards, all of them by default.
+
+    The split and shard selection arguments are resolved against the hub
+    file listing, see select_dataset_shards, and only the selected shards
+    are fetched. ``allow_patterns``, when given, replaces the selection.
+
+    Returns:
+        pathlib.Path: The local directory holding the parquet shards.
+    """
     import huggingface_hub as hf_hub
 
+    if allow_patterns is None:
+        allow_patterns = _shard_selection_patterns(
+            dataset_name,
+            splits=splits,
+            num_shards=num_shards,
+            shard_range=shard_range,
+            shard_fraction=shard_fraction,
+            max_size_in_bytes=max_size_in_bytes,
+        )
     download_folder = hf_hub.snapshot_download(
         repo_id=dataset_name,
         repo_type="dataset",
         cache_dir=dataset_download_path,
         resume_download=True,
         max_workers=num_download_workers,
+        allow_patterns=allow_patterns,
         ignore_patterns=[],
     )
 
     return pathlib.Path(download_folder) / "data"
 
 
-def load_dataset_via_hub(
+@dataclass
+class DatasetDownload:
+    """A shard download running in the background, see
+    start_dataset_download.
+
+    ``dataset_path`` is where the shards land. A shard only appears there
+    once it is complete, so load_dataset_from_parquet can be pointed at it
+    while the download is still running.
+    """
+
+    dataset_path: pathlib.Path
+    futures: dict[str, list[Future]]
+
+    def done(self) -> bool:
+        return all(
+            future.done()
+            for split_futures in self.futures.values()
+            for future in split_futures
+        )
+
+    def downloaded_files(self, split: str | None = None) -> list[str]:
+        return [
+            future.result()
+            for split_name, split_futures in self.futures.items()
+            if split is None or split_name == split
+            for future in split_futures
+            if future.done() and future.exception() is None
+        ]
+
+    def wait(self) -> pathlib.Path:
+        """Blocks until every shard is downloaded, raising the first
+        download error."""
+        for split_futures in self.futures.values():
+            for future in split_futures:
+                future.result()
+        return self.dataset_path
+
+
+def start_dataset_download(
+    dataset_name: str,
     dataset_download_path: pathlib.Path,
-    dataset_cache_path: pathlib.Path,
     num_download_workers: int = mp.cpu_count(),
-    dataset_name: str | None = None,
-):
+    splits: list[str] | None = None,
+    num_shards: int | None = None,
+    shard_range: tuple[int, int] | None = None,
+    shard_fraction: float | None = None,
+    max_size_in_bytes: int | None = None,
+) -> DatasetDownload:
+    """Starts downloading the selected shards and returns immediately.
+
+    Takes the same arguments as download_dataset_via_hub. Shards are
+    fetched one split at a time in turn, so that every split has data to
+    load early on.
 
-    dataset_path = download_dataset_via_hub(
-        dataset_download_path=dataset_download_path,
-        num_download_workers=num_download_workers,
-        dataset_name=dataset_name,
+    Returns:
+        DatasetDownload: Handle to poll or wait on.
+    """
+    import huggingface_hub as hf_hub
+    from huggingface_hub.file_download import repo_folder_name
+
+    revision = hf_hub.HfApi().dataset_info(dataset_name).sha
+    shards = select_dataset_shards(
+        list_dataset_shards(dataset_name, splits=splits, revision=revision),
+        num_shards=num_shards,
+        shard_range=shard_range,
+        shard_fraction=shard_fraction,
+        max_size_in_bytes=max_size_in_bytes,
     )
-    # Building a list of file paths for validation set
 
-    train_files = [
-        file.as_posix()
-        for file in pathlib.Path(dataset_path).glob("*.parquet")
-        if "train" in file.as_posix()
-    ]
-    val_files = [
-        file.as_posix()
-        for file in pathlib.Path(dataset_path).glob("*.parquet")
-        if "val" in file.as_posix()
-    ]
-    test_files = [
-        file.as_posix()
-        for file in pathlib.Path(dataset_path).glob("*.parquet")
-        if "test" in file.as_posix()
-    ]
-    print(
-        f"Found {len(test_files)} files for testing set, {len(train_files)} for training set and {len(val_files)} for validation set"
+    executor = ThreadPoolExecutor(max_workers=num_download_workers)
+    futures = {split: [] for split in shards}
+    for shard_idx in range(max(map(len, shards.values()), default=0)):
+        for split, split_shards in shards.items():
+            if shard_idx < len(split_shards):
+                futures[split].append(
+                    executor.submit(
+                        hf_hub.hf_hub_download,
+                        repo_id=dataset_name,
+                        filename=split_shards[shard_idx][0],
+                        repo_type="dataset",
+                        revision=revision,
+                        cache_dir=dataset_download_path,
+                    )
+                )
+    executor.shutdown(wait=False)
+
+    dataset_path = (
+        pathlib.Path(dataset_download_path)
+        / repo_folder_name(repo_id=dataset_name, repo_type="dataset")
+        / "snapshots"
+        / revision
+        / "data"
     )
-    data_files = {
-        "test": test_files,
-        "val": val_files,
-        "train": train_files,
-    }
+    return DatasetDownload(dataset_path=dataset_path, futures=futures)
+
+
+def get_tali_features(decode_images: bool = True) -> datasets.Features:
+    from datasets import Features, Image, Sequence, Value
 
-    features = Features(
+    return Features(
         {
-            "image": Image(
-                decode=True
-            ),  # Set `decode=True` if you want to decode the images, otherwise `decode=False`
+            # With `decode=False` rows carry the raw bytes, see decode_image
+            "image": Image(decode=decode_images),
             "image_url": Value("string"),
             "item_idx": Value("int64"),
             "wit_features": Sequence(
@@ -447,67 +1052,567 @@ def load_dataset_via_hub(
         }
     )
 
-    dataset = datasets.load_dataset(
-        "parquet" if dataset_name is None else dataset_name,
-        data_files=data_files,
-        features=features,
-        num_proc=mp.cpu_count() * 2,
-        cache_dir=dataset_cache_path,
-    )
-    return dataset
 
+def get_unused_columns(modality_list: list | None) -> list[str]:
+    """Heavy columns a TALIBaseTransform with ``modality_list`` never reads.
 
-def default_transforms():
-    from transformers import CLIPProcessor, WhisperProcessor
+    ``youtube_video_content`` holds the full MP4 of every row and is only
+    needed for the YouTube video, audio and frame modalities, and ``image``
+    only for the Wikipedia image. Drop these from an already loaded
+    dataset with ``dataset.remove_columns``.
+    """
+    if modality_list is None:
+        return []
 
-    image_text_model_name = "openai/clip-vit-base-patch16"
-    audio_model_name = "openai/whisper-base"
-    image_text_processor = CLIPProcessor.from_pretrained(image_text_model_name)
-    audio_processor = WhisperProcessor.from_pretrained(audio_model_name)
+    unused_columns = []
+    if not any(
+        sub_modality in modality_list
+        for sub_modality in YOUTUBE_CLIP_SUB_MODALITIES
+    ):
+        unused_columns.append(TALIKeys.youtube_video_content.value)
+    if SubModalityTypes.wikipedia_caption_image not in modality_list:
+        unused_columns.append(TALIKeys.image.value)
+    return unused_columns
 
-    def image_transforms(x):
-        if isinstance(x, PIL.Image.Image):
-            temp_x = np.array(x)
-            if temp_x.max() > 255:
-                temp_x = temp_x / 65535.0
-                temp_x = (temp_x * 255).astype(np.uint8)
-                x = PIL.Image.fromarray(temp_x)
 
-        return image_text_processor(
-            images=x, return_tensors="pt"
-        ).pixel_values.squeeze(1)
+def load_dataset_via_hub(
+    dataset_download_path: pathlib.Path,
+    dataset_cache_path: pathlib.Path,
+    num_download_workers: int = mp.cpu_count(),
+    dataset_name: str | None = None,
+    modality_list: list | None = None,
+    decode_images: bool = True,
+    splits: list[str] | None = None,
+    num_shards: int | None = None,
+    shard_range: tuple[int, int] | None = None,
+    shard_fraction: float | None = None,
+    max_size_in_bytes: int | None = None,
+    streaming: bool = False,
+    distributed: bool = False,
+    rank: int | None = None,
+    world_size: int | None = None,
+):
+    """Downloads TALI from the hub and loads it, see
+    load_dataset_from_parquet.
+
+    With ``streaming=True`` nothing is downloaded or cached: the selected
+    shards are read straight from the hub as an IterableDatasetDict, see
+    prepare_streaming_dataset.
+
+    With ``distributed=True``, or an explicit ``world_size``, every rank
+    only downloads, caches and reads its own shards, see
+    assign_shards_to_rank. ``rank`` and ``world_size`` default to those of
+    torch.distributed or torchrun's environment. Splits with fewer shards
+    than ranks are read in full by every rank, with local rank 0 building
+    the node's cache first, and split by rows instead. A non-streaming
+    train split is padded to the largest rank's row count so every rank
+    runs the same number of steps, which needs an initialised process
+    group. Evaluation splits are never padded, as their ranks' row counts
+    may differ.
+    """
+    shards = None
+    if streaming or distributed or world_size is not None:
+        shards = select_dataset_shards(
+            list_dataset_shards(dataset_name, splits=splits),
+            num_shards=num_shards,
+            shard_range=shard_range,
+            shard_fraction=shard_fraction,
+            max_size_in_bytes=max_size_in_bytes,
+        )
 
-    def text_transforms(x):
-        return image_text_processor(
-            text=x, return_tensors="pt", padding=True, truncation=True
-        ).input_ids.squeeze(0)
+    if distributed or world_size is not None:
+        rank, world_size = get_rank_and_world_size(rank, world_size)
+        return _load_dataset_for_rank(
+            shards=shards,
+            rank=rank,
+            world_size=world_size,
+            dataset_download_path=dataset_download_path,
+            dataset_cache_path=dataset_cache_path,
+            num_download_workers=num_download_workers,
+            dataset_name=dataset_name,
+            modality_list=modality_list,
+            decode_images=decode_images,
+            streaming=streaming,
+        )
 
-    def audio_transforms(x):
-        return torch.cat(
-            [
-                audio_processor(
-                    item.view(-1),
-                    sampling_rate=16000,
-                    return_tensors="pt",
-                ).input_features
-                for item in x
+    if streaming:
+        data_files = {
+            split: [
+                f"hf://datasets/{dataset_name}/{path}"
+                for path, _ in split_shards
             ]
+            for split, split_shards in shards.items()
+        }
+        return _load_parquet_data_files(
+            data_files=data_files,
+            dataset_cache_path=dataset_cache_path,
+            modality_list=modality_list,
+            decode_images=decode_images,
+            streaming=True,
         )
 
-    def video_transforms(x):
-        return torch.stack(
-            [image_transforms(image) for image in x],
-            dim=0,
-        )
+    dataset_path = download_dataset_via_hub(
+        dataset_download_path=dataset_download_path,
+        num_download_workers=num_download_workers,
+        dataset_name=dataset_name,
+        splits=splits,
+        num_shards=num_shards,
+        shard_range=shard_range,
+        shard_fraction=shard_fraction,
+        max_size_in_bytes=max_size_in_bytes,
+    )
 
-    return (
-        image_transforms,
+    return load_dataset_from_parquet(
+        dataset_path=dataset_path,
+        dataset_cache_path=dataset_cache_path,
+        dataset_name=dataset_name,
+        modality_list=modality_list,
+        decode_images=decode_images,
+    )
+
+
+def _load_dataset_for_rank(
+    shards: dict[str, list[tuple[str, int]]],
+    rank: int,
+    world_size: int,
+    dataset_download_path: pathlib.Path,
+    dataset_cache_path: pathlib.Path,
+    num_download_workers: int,
+    dataset_name: str,
+    modality_list: list | None,
+    decode_images: bool,
+    streaming: bool,
+):
+    rank_shards = {}
+    row_split_names = []
+    for split, split_shards in shards.items():
+        if len(split_shards) < world_size:
+            rank_shards[split] = split_shards
+            row_split_names.append(split)
+        else:
+            rank_shards[split] = assign_shards_to_rank(
+                split_shards, rank=rank, world_size=world_size
+            )
+
+    if streaming:
+        from datasets.distributed import split_dataset_by_node
+
+        dataset = _load_parquet_data_files(
+            data_files={
+                split: [
+                    f"hf://datasets/{dataset_name}/{path}"
+                    for path, _ in split_shards
+                ]
+                for split, split_shards in rank_shards.items()
+            },
+            dataset_cache_path=dataset_cache_path,
+            modality_list=modality_list,
+            decode_images=decode_images,
+            streaming=True,
+        )
+        for split in row_split_names:
+            if split in dataset:
+                dataset[split] = split_dataset_by_node(
+                    dataset[split], rank=rank, world_size=world_size
+                )
+        return dataset
+
+    # Shards are disjoint across ranks unless a split is row split
+    with (
+        local_main_process_first()
+        if len(row_split_names) > 0
+        else contextlib.nullcontext()
+    ):
+        dataset_path = download_dataset_via_hub(
+            dataset_name=dataset_name,
+            dataset_download_path=dataset_download_path,
+            num_download_workers=num_download_workers,
+            allow_patterns=[
+                path
+                for split_shards in rank_shards.values()
+                for path, _ in split_shards
+            ],
+        )
+        dataset = _load_parquet_data_files(
+            data_files={
+                split: [
+                    (dataset_path.parent / path).as_posix()
+                    for path, _ in split_shards
+                ]
+                for split, split_shards in rank_shards.items()
+            },
+            dataset_cache_path=dataset_cache_path,
+            modality_list=modality_list,
+            decode_images=decode_images,
+        )
+
+    if world_size > 1 and not (
+        torch.distributed.is_available() and torch.distributed.is_initialized()
+    ):
+        logger.warning(
+            "No torch.distributed process group is initialised, so the "
+            "train split can not be padded to the largest rank's row count "
+            "and ranks may run different numbers of steps"
+        )
+    for split in list(dataset.keys()):
+        if split in row_split_names:
+            dataset[split] = dataset[split].shard(
+                num_shards=world_size, index=rank, contiguous=True
+            )
+        # Repeated rows would be counted twice by evaluation metrics
+        if split == "train":
+            dataset[split] = pad_dataset_to_num_rows(
+                dataset[split],
+                max_num_rows_across_ranks(len(dataset[split])),
+            )
+    return dataset
+
+
+def load_dataset_from_parquet(
+    dataset_path: pathlib.Path,
+    dataset_cache_path: pathlib.Path,
+    dataset_name: str | None = None,
+    modality_list: list | None = None,
+    decode_images: bool = True,
+    streaming: bool = False,
+):
+    """Loads the TALI parquet shards in ``dataset_path`` as a DatasetDict.
+
+    Args:
+        dataset_path (pathlib.Path): Directory holding the parquet shards.
+        dataset_cache_path (pathlib.Path): Where to build the Arrow cache.
+        dataset_name (str | None): Builder to load with, parquet when None.
+        modality_list (list | None): When given, only the columns these
+            sub-modalities need are read, see get_unused_columns, so that
+            text and image-text runs never touch the video payload.
+        decode_images (bool): When False, Wikipedia images stay encoded
+            bytes and TALIBaseTransform decodes them with decode_image.
+        streaming (bool): Iterate over the shards in place instead of
+            building the Arrow cache, returning an IterableDatasetDict.
+
+    Returns:
+        datasets.DatasetDict: The train, val and test splits that have at
+            least one shard in ``dataset_path``.
+    """
+    # Building a list of file paths for validation set
+
+    train_files = [
+        file.as_posix()
+        for file in pathlib.Path(dataset_path).glob("*.parquet")
+        if "train" in file.as_posix()
+    ]
+    val_files = [
+        file.as_posix()
+        for file in pathlib.Path(dataset_path).glob("*.parquet")
+        if "val" in file.as_posix()
+    ]
+    test_files = [
+        file.as_posix()
+        for file in pathlib.Path(dataset_path).glob("*.parquet")
+        if "test" in file.as_posix()
+    ]
+    print(
+        f"Found {len(test_files)} files for testing set, {len(train_files)} for training set and {len(val_files)} for validation set"
+    )
+    data_files = {
+        "test": test_files,
+        "val": val_files,
+        "train": train_files,
+    }
+
+    return _load_parquet_data_files(
+        data_files=data_files,
+        dataset_cache_path=dataset_cache_path,
+        dataset_name=dataset_name,
+        modality_list=modality_list,
+        decode_images=decode_images,
+        streaming=streaming,
+    )
+
+
+def _load_parquet_data_files(
+    data_files: dict[str, list[str]],
+    dataset_cache_path: pathlib.Path,
+    dataset_name: str | None = None,
+    modality_list: list | None = None,
+    decode_images: bool = True,
+    streaming: bool = False,
+):
+    # Splits that were not downloaded are left out rather than failing
+    data_files = {
+        split: files for split, files in data_files.items() if len(files) > 0
+    }
+
+    unused_columns = get_unused_columns(modality_list)
+    features = datasets.Features(
+        {
+            key: value
+            for key, value in get_tali_features(decode_images).items()
+            if key not in unused_columns
+        }
+    )
+    # Only project when asked to, so the default Arrow cache is unchanged
+    column_kwargs = (
+        dict(columns=list(features.keys())) if len(unused_columns) > 0 else {}
+    )
+
+    if streaming:
+        return datasets.load_dataset(
+            "parquet" if dataset_name is None else dataset_name,
+            data_files=data_files,
+            features=features,
+            streaming=True,
+            **column_kwargs,
+        )
+
+    dataset = datasets.load_dataset(
+        "parquet" if dataset_name is None else dataset_name,
+        data_files=data_files,
+        features=features,
+        num_proc=mp.cpu_count() * 2,
+        cache_dir=dataset_cache_path,
+        **column_kwargs,
+    )
+    return dataset
+
+
+def prepare_streaming_dataset(
+    dataset: datasets.IterableDataset,
+    transform: Callable | None = None,
+    batch_size: int = 16,
+    shuffle_buffer_size: int | None = 1000,
+    seed: int = 42,
+    rank: int | None = None,
+    world_size: int | None = None,
+) -> datasets.IterableDataset:
+    """Shuffles, shards and transforms a streamed TALI split lazily.
+
+    Shuffling permutes the shard order and then samples rows from a
+    ``shuffle_buffer_size`` row buffer, call ``set_epoch`` on the result to
+    reshuffle every epoch. With ``rank`` and ``world_size`` each node only
+    reads its share of the shards (rows, when the shard count does not
+    divide evenly). DataLoader workers are in turn given disjoint shards of
+    their node's share by ``datasets`` itself.
+
+    Args:
+        dataset (datasets.IterableDataset): A split from
+            load_dataset_via_hub or load_dataset_from_parquet with
+            ``streaming=True``.
+        transform (Callable | None): Usually a TALIBaseTransform, applied
+            to ``batch_size`` rows at a time as they are read. The raw
+            columns are dropped from the output.
+        batch_size (int): Rows per transform call.
+        shuffle_buffer_size (int | None): Rows held in the shuffle buffer,
+            no shuffling when None.
+        seed (int): Seed for the shard order and the buffer.
+        rank (int | None): This node's rank.
+        world_size (int | None): The number of nodes.
+
+    Returns:
+        datasets.IterableDataset: The prepared dataset.
+    """
+    if shuffle_buffer_size is not None:
+        dataset = dataset.shuffle(seed=seed, buffer_size=shuffle_buffer_size)
+
+    if world_size is not None and world_size > 1:
+        from datasets.distributed import split_dataset_by_node
+
+        dataset = split_dataset_by_node(
+            dataset, rank=rank, world_size=world_size
+        )
+
+    if transform is not None:
+        dataset = dataset.map(
+            transform,
+            batched=True,
+            batch_size=batch_size,
+            remove_columns=list(dataset.column_names or []),
+        )
+
+    return dataset
+
+
+def decode_image(
+    image: PIL.Image.Image | dict | bytes, image_size: int | None = None
+) -> PIL.Image.Image:
+    """Decodes an undecoded ``datasets.Image`` value into a PIL image.
+
+    JPEGs are decoded in draft mode, letting the decoder downscale by up to
+    8x while keeping both sides at least ``image_size``, which is all the
+    CLIP resize and crop that follows needs.
+
+    Args:
+        image (PIL.Image.Image | dict | bytes): ``{"bytes", "path"}`` dict
+            or raw bytes. Already decoded images are returned unchanged.
+        image_size (int | None): Smallest side length to decode to, full
+            resolution when None.
+
+    Returns:
+        PIL.Image.Image: The decoded image.
+    """
+    if isinstance(image, PIL.Image.Image):
+        return image
+
+    if isinstance(image, dict):
+        image = (
+            image["bytes"] if image.get("bytes") is not None else image["path"]
+        )
+    image = PIL.Image.open(
+        io.BytesIO(image) if isinstance(image, bytes) else image
+    )
+    if image_size is not None:
+        image.draft("RGB", (image_size, image_size))
+    image.load()
+    return image
+
+
+@functools.lru_cache
+def _clip_processor(model_name: str):
+    from transformers import CLIPProcessor
+
+    return CLIPProcessor.from_pretrained(model_name)
+
+
+@functools.lru_cache
+def _whisper_processor(model_name: str):
+    from transformers import WhisperProcessor
+
+    return WhisperProcessor.from_pretrained(model_name)
+
+
+def default_transforms(
+    image_text_model_name: str = "openai/clip-vit-base-patch16",
+    audio_model_name: str = "openai/whisper-base",
+):
+    """The image, text, audio and video transforms of TALIBaseTransform.
+
+    The CLIP and Whisper processors are loaded when a transform first needs
+    them, once per process, so building the transforms, pickling them into
+    DataLoader workers or calling default_transforms again costs nothing.
+    """
+
+    def to_8_bit(x):
+        if isinstance(x, PIL.Image.Image):
+            temp_x = np.array(x)
+            if temp_x.max() > 255:
+                temp_x = temp_x / 65535.0
+                temp_x = (temp_x * 255).astype(np.uint8)
+                x = PIL.Image.fromarray(temp_x)
+        return x
+
+    def image_transforms(x):
+        if isinstance(x, torch.Tensor) or (
+            isinstance(x, list)
+            and len(x) > 0
+            and all(isinstance(image, torch.Tensor) for image in x)
+        ):
+            return clip_pixel_values(
+                torch.stack(x) if isinstance(x, list) else x,
+                _clip_processor(image_text_model_name).image_processor,
+            )
+
+        x = (
+            [to_8_bit(image) for image in x]
+            if isinstance(x, list)
+            else to_8_bit(x)
+        )
+
+        return _clip_processor(image_text_model_name)(
+            images=x, return_tensors="pt"
+        ).pixel_values.squeeze(1)
+
+    def text_transforms(x):
+        return _clip_processor(image_text_model_name)(
+            text=x, return_tensors="pt", padding=True, truncation=True
+        ).input_ids.squeeze(0)
+
+    def audio_transforms(x):
+        feature_extractor = _whisper_processor(
+            audio_model_name
+        ).feature_extractor
+        # Whisper's input features for the whole batch in one STFT
+        return whisper_log_mel_spectrogram(
+            x if isinstance(x, torch.Tensor) else list(x),
+            num_mel_bins=feature_extractor.feature_size,
+            sampling_rate=feature_extractor.sampling_rate,
+            n_fft=feature_extractor.n_fft,
+            hop_length=feature_extractor.hop_length,
+            chunk_length=feature_extractor.chunk_length,
+        )
+
+    def video_transforms(x):
+        # One call for all frames, laid out as per-frame processor calls
+        return image_transforms(
+            x if isinstance(x, torch.Tensor) else list(x)
+        ).unsqueeze(1)
+
+    # Identifies the outputs in caches persisted across runs
+    image_transforms.tokenizer_id = f"clip-image:{image_text_model_name}"
+    text_transforms.tokenizer_id = f"clip-text:{image_text_model_name}"
+    audio_transforms.tokenizer_id = f"whisper:{audio_model_name}"
+    video_transforms.tokenizer_id = f"clip-video:{image_text_model_name}"
+
+    return (
+        image_transforms,
         text_transforms,
         audio_transforms,
         video_transforms,
     )
 
 
+def load_video_clip(
+    x: bytes | str | pathlib.Path,
+    start: int,
+    end: int,
+    seed: int,
+    config: TALIBaseTransformConfig,
+    return_video: bool = False,
+    return_audio: bool = False,
+    return_image: bool = False,
+):
+    return videoclip_to_video_audio_tensors(
+        video_data=x,
+        image_size=config.image_size,
+        starting_second=start,
+        ending_second=end,
+        return_video=return_video,
+        return_audio=return_audio,
+        return_image=return_image,
+        num_audio_frames=config.num_audio_frames,
+        num_video_frames=config.num_video_frames,
+        rng=np.random.RandomState(seed),
+        video_frame_format=config.video_frames_format,
+        keep_uint8=config.video_frames_uint8,
+        resample_audio_in_decoder=config.resample_audio_in_decoder,
+        video_decoding_mode=config.video_decoding_mode,
+        clip_duration_in_seconds=config.clip_duration_in_seconds,
+    )
+
+
+def _with_batch_dim(value: torch.Tensor, batch_size: int) -> torch.Tensor:
+    # Tokenizers squeeze a leading batch dimension of one
+    return value if value.shape[0] == batch_size else value.unsqueeze(0)
+
+
+def _collate(values: list):
+    if all(isinstance(value, torch.Tensor) for value in values) and (
+        len({value.shape for value in values}) == 1
+    ):
+        return torch.stack(values)
+    if all(
+        isinstance(value, int | float) and not isinstance(value, bool)
+        for value in values
+    ):
+        return torch.tensor(values)
+    return values
+
+
+def _tokenizer_id(function: Callable | None) -> str | None:
+    """The ``tokenizer_id`` a tokenizer is tagged with, see
+    default_transforms, None when it has none."""
+    return getattr(function, "tokenizer_id", None)
+
+
 class TALIBaseTransform:
     def __init__(
         self,
@@ -517,6 +1622,7 @@ class TALIBaseTransform:
         image_tokenizer: Callable | None = None,
         audio_tokenizer: Callable | None = None,
         video_tokenizer: Callable | None = None,
+        profiling_sink: ProfilingSink | None = None,
     ):
         self.cache_dir = cache_dir
         self.config = config
@@ -524,101 +1630,287 @@ class TALIBaseTransform:
         self.image_tokenizer = image_tokenizer
         self.audio_tokenizer = audio_tokenizer
         self.video_tokenizer = video_tokenizer
+        self.profiling_sink = profiling_sink
 
         self.select_subtitles_between_timestamps = (
             select_subtitles_between_timestamps
         )
         self.video_transform = self.build_video_loader()
+        self._decode_executor = None
+        self._clip_cache = None
+        self._wikipedia_cache = None
 
     def build_video_loader(self):
-        def loader(
-            x: bytes | str | pathlib.Path,
-            start: int,
-            end: int,
-            seed: int,
-            return_video: bool = False,
-            return_audio: bool = False,
-            return_image: bool = False,
-        ):
-            return videoclip_to_video_audio_tensors(
-                video_data=x,
-                image_size=self.config.image_size,
-                starting_second=start,
-                ending_second=end,
-                return_video=return_video,
-                return_audio=return_audio,
-                return_image=return_image,
-                num_audio_frames=self.config.num_audio_frames,
-                num_video_frames=self.config.num_video_frames,
-                rng=np.random.RandomState(seed),
-                video_frame_format=self.config.video_frames_format,
-            )
-
-        return loader
+        return functools.partial(load_video_clip, config=self.config)
+
+    def __getstate__(self):
+        # Executors cannot be pickled, each process builds its own
+        state = self.__dict__.copy()
+        state["_decode_executor"] = None
+        state["_clip_cache"] = None
+        state["_wikipedia_cache"] = None
+        return state
+
+    def __del__(self):
+        if getattr(self, "_decode_executor", None) is not None:
+            self._decode_executor.shutdown(wait=False)
+
+    def _get_decode_executor(self):
+        if self._decode_executor is None:
+            executor_class = (
+                ThreadPoolExecutor
+                if DecodeExecutorTypes(self.config.decode_executor)
+                == DecodeExecutorTypes.thread
+                else ProcessPoolExecutor
+            )
+            if (
+                executor_class is ProcessPoolExecutor
+                and mp.current_process().daemon
+            ):
+                logger.warning(
+                    "decode_executor='process' can not be used in a "
+                    "daemonic process such as a DataLoader worker, "
+                    "decoding on threads instead"
+                )
+                executor_class = ThreadPoolExecutor
+            self._decode_executor = executor_class(
+                max_workers=self.config.num_decode_workers
+            )
+        return self._decode_executor
 
     def _process_wikipedia_text(self, wikipedia_features: dict):
-        output_dict = dict()
-        for language in wikipedia_features["language"]:
-            language_idx = wikipedia_features["language"].index(language)
-            wit_text = {
-                key: wikipedia_features[key][language_idx]
-                for key in WIKIPEDIA_ENTRY_KEYS
-                if wikipedia_features[key][language_idx] is not None
-            }
-            output_dict[language] = wit_text
-        return output_dict
+        return wikipedia_text_by_language(wikipedia_features)
 
     def _process_youtube_subtitles(
-        self, youtube_subtitle_text: str, youtube_video_starting_time: int
+        self,
+        youtube_subtitle_text: str,
+        youtube_video_starting_time: int,
+        subtitle_index: tuple[list[float], str, list[int]] | None = None,
+        clip_starting_second: float = 0.0,
     ):
+        # Subtitles are timed from the start of the YouTube video, clips
+        # from the start of the stored excerpt
+        starting_timestamp = (
+            int(youtube_video_starting_time) + clip_starting_second
+        )
+        ending_timestamp = (
+            starting_timestamp + self.config.clip_duration_in_seconds
+        )
         return (
             "<ysub> "
-            + select_subtitles_between_timestamps(
-                subtitle_dict=youtube_subtitle_text,
-                starting_timestamp=int(youtube_video_starting_time),
-                ending_timestamp=int(youtube_video_starting_time)
-                + int(self.config.video_frame_duration),
+            + (
+                select_subtitles_from_index(
+                    *subtitle_index,
+                    starting_timestamp=starting_timestamp,
+                    ending_timestamp=ending_timestamp,
+                )
+                if subtitle_index is not None
+                else select_subtitles_between_timestamps(
+                    subtitle_dict=youtube_subtitle_text,
+                    starting_timestamp=starting_timestamp,
+                    ending_timestamp=ending_timestamp,
+                )
             )
             + " </ysub>"
         )
 
+    def _clip_starting_second(self, input_dict: dict[str, Any]) -> float:
+        """The start of the window the clip of ``input_dict`` is decoded
+        from, probed from the container's metadata when no clip is.
+
+        Text-only configs never open the video, and may not even have the
+        ``youtube_video_content`` column, see get_unused_columns, so their
+        window is drawn from ``video_frame_duration`` alone.
+        """
+        if (
+            SubModalityTypes.youtube_subtitle_text
+            not in self.config.modality_list
+        ):
+            return 0.0
+        rng = np.random.RandomState(int(input_dict[TALIKeys.item_idx.value]))
+        if TALIKeys.youtube_video_content.value not in input_dict or not any(
+            sub_modality in self.config.modality_list
+            for sub_modality in YOUTUBE_CLIP_SUB_MODALITIES
+        ):
+            clip_starting_second, _ = select_clip_window(
+                starting_second=0,
+                ending_second=self.config.video_frame_duration,
+                clip_duration_in_seconds=self.config.clip_duration_in_seconds,
+                duration=None,
+                rng=rng,
+            )
+            return clip_starting_second
+        clip_starting_second, _ = probe_clip_window(
+            video_data=input_dict[TALIKeys.youtube_video_content.value],
+            starting_second=0,
+            ending_second=self.config.video_frame_duration,
+            clip_duration_in_seconds=self.config.clip_duration_in_seconds,
+            rng=rng,
+        )
+        return clip_starting_second
+
+    def _subtitle_index(self, input_dict: dict[str, Any]):
+        if TALIKeys.youtube_subtitle_timestamps.value not in input_dict:
+            return None
+        return (
+            input_dict[TALIKeys.youtube_subtitle_timestamps.value],
+            input_dict[TALIKeys.youtube_subtitle_indexed_text.value],
+            input_dict[TALIKeys.youtube_subtitle_offsets.value],
+        )
+
     def _convert_dict_to_string(self, input_dict: dict):
-        return "\n".join(
-            [f"{key}: {value}" for key, value in input_dict.items()]
+        return wikipedia_caption_string(input_dict)
+
+    def _tokenize_text(self, value: str | dict | torch.Tensor):
+        # Pretokenized text arrives as tensors and is passed through
+        if isinstance(value, torch.Tensor):
+            return value
+        if isinstance(value, str):
+            return self.text_tokenizer(value)
+        item_dict = {}
+        for sub_key, sub_value in value.items():
+            if isinstance(sub_value, str | torch.Tensor):
+                item_dict[sub_key] = self._tokenize_text(sub_value)
+            elif isinstance(sub_value, dict):
+                item_dict[sub_key] = {}
+                for (
+                    sub_sub_key,
+                    sub_sub_value,
+                ) in sub_value.items():
+                    item_dict[sub_key][sub_sub_key] = self._tokenize_text(
+                        sub_sub_value
+                    )
+        return item_dict
+
+    def _text_tokens(self, input_dict: dict[str, Any], key: TALIKeys):
+        """The ``key`` token ids added by pretokenize_text, as the text
+        tokenizer would return them, or None when they are not available."""
+        if self.text_tokenizer is None or key.value not in input_dict:
+            return None
+        return input_dict[key.value]
+
+    def _process_wikipedia_caption(
+        self,
+        input_dict: dict[str, Any],
+        caption_language: str | None,
+        language_positions: dict[str, int],
+        tokenize: bool = True,
+    ):
+        """The caption of ``caption_language``, or of every language when
+        None, tokenized unless it was pretokenized or ``tokenize`` is
+        off."""
+        caption = self._pretokenized_caption(
+            input_dict, caption_language, language_positions
+        )
+        if caption is not None:
+            return caption
+
+        wikipedia_features = input_dict[TALIKeys.wit_features.value]
+        caption = (
+            self._convert_dict_to_string(
+                wikipedia_text_at(
+                    wikipedia_features, language_positions[caption_language]
+                )
+            )
+            if caption_language is not None
+            else self._process_wikipedia_text(wikipedia_features)
         )
+        if tokenize and self.text_tokenizer is not None:
+            caption = self._tokenize_text(caption)
+        return caption
+
+    def _text_or_tokens(
+        self, input_dict: dict[str, Any], key: TALIKeys, tokens_key: TALIKeys
+    ):
+        tokens = self._text_tokens(input_dict, tokens_key)
+        if tokens is None:
+            return input_dict[key.value]
+        return torch.tensor(tokens, dtype=torch.long)
 
-    def _process_text(self, input_dict: dict[str, Any]):
-        wikipedia_text_content = self._process_wikipedia_text(
-            input_dict[TALIKeys.wit_features.value]
+    def _pretokenized_caption(
+        self,
+        input_dict: dict[str, Any],
+        caption_language: str | None,
+        language_positions: dict[str, int],
+    ):
+        if caption_language is not None:
+            caption_tokens = self._text_tokens(
+                input_dict, TALIKeys.wikipedia_caption_text_tokens
+            )
+            if caption_tokens is None:
+                return None
+            return torch.tensor(
+                caption_tokens[language_positions[caption_language]],
+                dtype=torch.long,
+            )
+
+        entry_tokens = self._text_tokens(
+            input_dict, TALIKeys.wikipedia_entry_tokens
         )
+        if entry_tokens is None:
+            return None
+        output_dict = {}
+        for language, language_idx in language_positions.items():
+            output_dict[language] = {
+                key: torch.tensor(
+                    entry_tokens[key][language_idx], dtype=torch.long
+                )
+                for key in WIKIPEDIA_ENTRY_KEYS
+                if entry_tokens[key][language_idx] is not None
+            }
+        return output_dict
+
+    def _process_text(
+        self,
+        input_dict: dict[str, Any],
+        tokenize: bool = True,
+        clip_starting_second: float | None = None,
+    ):
+        if clip_starting_second is None:
+            clip_starting_second = self._clip_starting_second(input_dict)
+        wikipedia_features = input_dict[TALIKeys.wit_features.value]
+        language_positions = wikipedia_language_positions(wikipedia_features)
+        caption_language = None
         if not self.config.return_all_caption_languages:
+            # Only the caption of the chosen language is materialised
             if self.config.priority_caption_language is not None:
-                if (
-                    self.config.priority_caption_language
-                    in wikipedia_text_content
-                ):
+                if self.config.priority_caption_language in language_positions:
                     caption_language = self.config.priority_caption_language
                 else:
                     # random choice
-                    caption_language = random.choice(
-                        wikipedia_text_content.keys()
-                    )
+                    caption_language = random.choice(list(language_positions))
             else:
-                caption_language = random.choice(wikipedia_text_content.keys())
-
-            wikipedia_text_content = wikipedia_text_content[caption_language]
-            wikipedia_text_content = self._convert_dict_to_string(
-                wikipedia_text_content
+                caption_language = random.choice(list(language_positions))
+
+        process_caption = functools.partial(
+            self._process_wikipedia_caption,
+            input_dict,
+            caption_language,
+            language_positions,
+            tokenize,
+        )
+        # Captions drawn at random differ between epochs and are not cached
+        wikipedia_text_content = (
+            self._cached_wikipedia_value(
+                input_dict, "caption", tokenize, process_caption
             )
+            if self.config.return_all_caption_languages
+            or caption_language == self.config.priority_caption_language
+            else process_caption()
+        )
 
         output_dict = {
             SubModalityTypes.wikipedia_caption_text.value.name: wikipedia_text_content,
-            SubModalityTypes.youtube_description_text.value.name: input_dict[
-                TALIKeys.youtube_description_text.value
-            ],
-            SubModalityTypes.youtube_title_text.value.name: input_dict[
-                TALIKeys.youtube_title_text.value
-            ],
+            SubModalityTypes.youtube_description_text.value.name: self._text_or_tokens(
+                input_dict,
+                TALIKeys.youtube_description_text,
+                TALIKeys.youtube_description_text_tokens,
+            ),
+            SubModalityTypes.youtube_title_text.value.name: self._text_or_tokens(
+                input_dict,
+                TALIKeys.youtube_title_text,
+                TALIKeys.youtube_title_text_tokens,
+            ),
             SubModalityTypes.youtube_subtitle_text.value.name: self._process_youtube_subtitles(
                 youtube_subtitle_text=input_dict[
                     TALIKeys.youtube_subtitle_text.value
@@ -626,32 +1918,21 @@ class TALIBaseTransform:
                 youtube_video_starting_time=input_dict[
                     TALIKeys.youtube_video_starting_time.value
                 ],
+                subtitle_index=self._subtitle_index(input_dict),
+                clip_starting_second=clip_starting_second,
             ),
         }
 
-        if self.text_tokenizer is not None:
+        if tokenize and self.text_tokenizer is not None:
             for key, value in output_dict.items():
-                if isinstance(value, str):
-                    output_dict[key] = self.text_tokenizer(value)
-                elif isinstance(value, dict):
-                    item_dict = {}
-                    for sub_key, sub_value in value.items():
-                        if isinstance(sub_value, str):
-                            item_dict[sub_key] = self.text_tokenizer(sub_value)
-                        elif isinstance(sub_value, dict):
-                            item_dict[sub_key] = {}
-                            for (
-                                sub_sub_key,
-                                sub_sub_value,
-                            ) in sub_value.items():
-                                item_dict[sub_key][sub_sub_key] = (
-                                    self.text_tokenizer(sub_sub_value)
-                                )
-                    output_dict[key] = item_dict
+                if isinstance(value, str | dict):
+                    output_dict[key] = self._tokenize_text(value)
 
         return output_dict
 
-    def _process_audio(self, input_dict: dict[str, Any], audio: None):
+    def _process_audio(
+        self, input_dict: dict[str, Any], audio: None, tokenize: bool = True
+    ):
         output_dict = {}
         if SubModalityTypes.youtube_content_audio in self.config.modality_list:
             output_dict[SubModalityTypes.youtube_content_audio.value.name] = (
@@ -661,20 +1942,22 @@ class TALIBaseTransform:
                     else self.video_transform(
                         x=input_dict[TALIKeys.youtube_video_content.value],
                         start=0,
-                        end=30,
+                        end=self.config.video_frame_duration,
                         seed=int(input_dict[TALIKeys.item_idx.value]),
                         return_audio=True,
                     )["audio"]
                 ),
             )
 
-        if self.audio_tokenizer is not None:
+        if tokenize and self.audio_tokenizer is not None:
             for key, value in output_dict.items():
                 output_dict[key] = self.audio_tokenizer(value)
 
         return output_dict
 
-    def _process_image(self, input_dict: dict[str, Any], image: None):
+    def _process_image(
+        self, input_dict: dict[str, Any], image: None, tokenize: bool = True
+    ):
         output_dict = {}
         if (
             SubModalityTypes.youtube_random_video_frame
@@ -688,28 +1971,48 @@ class TALIBaseTransform:
                 else self.video_transform(
                     x=input_dict[TALIKeys.youtube_video_content.value],
                     start=0,
-                    end=30,
+                    end=self.config.video_frame_duration,
                     seed=int(input_dict[TALIKeys.item_idx.value]),
                     return_image=True,
                 )["image"]
             )
 
+        if tokenize and self.image_tokenizer is not None:
+            for key, value in output_dict.items():
+                output_dict[key] = self.image_tokenizer(value)
+
         if (
             SubModalityTypes.wikipedia_caption_image
             in self.config.modality_list
         ):
             output_dict[
                 SubModalityTypes.wikipedia_caption_image.value.name
-            ] = input_dict[TALIKeys.image.value]
-
-        if self.image_tokenizer is not None:
-            for key, value in output_dict.items():
-                output_dict[key] = self.image_tokenizer(value)
+            ] = self._cached_wikipedia_value(
+                input_dict,
+                "image",
+                tokenize,
+                functools.partial(
+                    self._process_wikipedia_image, input_dict, tokenize
+                ),
+            )
 
         return output_dict
 
+    def _process_wikipedia_image(
+        self, input_dict: dict[str, Any], tokenize: bool = True
+    ):
+        image = decode_image(
+            input_dict[TALIKeys.image.value], self.config.image_size
+        )
+        if tokenize and self.image_tokenizer is not None:
+            image = self.image_tokenizer(image)
+        return image
+
     def _process_video(
-        self, input_dict: dict[str, Any], video: [Optional] = None
+        self,
+        input_dict: dict[str, Any],
+        video: [Optional] = None,
+        tokenize: bool = True,
     ):
         output_dict = {}
         if SubModalityTypes.youtube_content_video in self.config.modality_list:
@@ -720,19 +2023,295 @@ class TALIBaseTransform:
                     else self.video_transform(
                         x=input_dict[TALIKeys.youtube_video_content.value],
                         start=0,
-                        end=30,
+                        end=self.config.video_frame_duration,
                         seed=int(input_dict[TALIKeys.item_idx.value]),
                         return_video=True,
                     )["video"]
                 ),
             }
-        if self.video_tokenizer is not None:
+        if tokenize and self.video_tokenizer is not None:
             for key, value in output_dict.items():
                 output_dict[key] = self.video_tokenizer(value)
 
         return output_dict
 
-    def _apply_transform(self, input_dict: dict[str, Any]):
+    def _youtube_decode_request(
+        self, input_dict: dict[str, Any]
+    ) -> dict[str, Any] | None:
+        modality_list = self.config.modality_list
+        return_video = SubModalityTypes.youtube_content_video in modality_list
+        return_audio = SubModalityTypes.youtube_content_audio in modality_list
+        return_image = (
+            SubModalityTypes.youtube_random_video_frame in modality_list
+        )
+        if not (return_video or return_audio or return_image):
+            return None
+
+        return dict(
+            x=input_dict[TALIKeys.youtube_video_content.value],
+            start=0,
+            end=self.config.video_frame_duration,
+            seed=int(input_dict[TALIKeys.item_idx.value]),
+            return_video=return_video,
+            return_audio=return_audio,
+            return_image=return_image,
+        )
+
+    def _clip_cache_metadata(self) -> dict[str, Any]:
+        return dict(
+            image_size=self.config.image_size,
+            num_video_frames=self.config.num_video_frames,
+            num_audio_frames=self.config.num_audio_frames,
+            resample_audio_in_decoder=self.config.resample_audio_in_decoder,
+            video_decoding_mode=self.config.video_decoding_mode,
+            clip_duration_in_seconds=self.config.clip_duration_in_seconds,
+            video_frame_duration=self.config.video_frame_duration,
+        )
+
+    def _wikipedia_cache_key(self) -> str:
+        """Hash of everything the processed Wikipedia image and caption of
+        a ``wit_idx`` depend on."""
+        if self.config.wikipedia_cache_key is None and any(
+            tokenizer is not None and _tokenizer_id(tokenizer) is None
+            for tokenizer in (self.text_tokenizer, self.image_tokenizer)
+        ):
+            raise ValueError(
+                "use_wikipedia_disk_cache needs tokenizers tagged with a "
+                "tokenizer_id or a wikipedia_cache_key naming them, or "
+                "values of another tokenizer may be read back"
+            )
+        settings = dict(
+            image_size=self.config.image_size,
+            priority_caption_language=self.config.priority_caption_language,
+            return_all_caption_languages=(
+                self.config.return_all_caption_languages
+            ),
+            text_tokenizer=_tokenizer_id(self.text_tokenizer),
+            image_tokenizer=_tokenizer_id(self.image_tokenizer),
+            wikipedia_cache_key=self.config.wikipedia_cache_key,
+        )
+        return hashlib.sha1(
+            json.dumps(settings, sort_keys=True).encode()
+        ).hexdigest()[:16]
+
+    def _get_wikipedia_cache(self) -> LRUCache | None:
+        if self._wikipedia_cache is None and (
+            self.config.wikipedia_cache_size_in_bytes > 0
+            or self.config.use_wikipedia_disk_cache
+        ):
+            self._wikipedia_cache = LRUCache(
+                max_size_in_bytes=self.config.wikipedia_cache_size_in_bytes,
+                disk_path=(
+                    pathlib.Path(self.cache_dir)
+                    / "wikipedia"
+                    / self._wikipedia_cache_key()
+                    if self.config.use_wikipedia_disk_cache
+                    else None
+                ),
+            )
+        return self._wikipedia_cache
+
+    def _cached_wikipedia_value(
+        self,
+        input_dict: dict[str, Any],
+        name: str,
+        tokenize: bool,
+        process: Callable[[], Any],
+    ):
+        """``process()``, looked up in and added to the Wikipedia cache by
+        the row's ``wit_idx`` when the cache is enabled."""
+        wikipedia_cache = self._get_wikipedia_cache()
+        if wikipedia_cache is None:
+            return process()
+
+        key = (
+            f"{int(input_dict[TALIKeys.wit_idx.value])}-{name}-{int(tokenize)}"
+        )
+        value = wikipedia_cache.get(key)
+        if value is None:
+            record_count("wikipedia_cache_misses")
+            value = process()
+            wikipedia_cache.put(key, value)
+        else:
+            record_count("wikipedia_cache_hits")
+        return value
+
+    def _get_clip_cache(self) -> ClipCache:
+        if self._clip_cache is None:
+            clip_cache = ClipCache(pathlib.Path(self.cache_dir) / "clips")
+            if (
+                clip_cache.metadata is not None
+                and clip_cache.metadata != self._clip_cache_metadata()
+            ):
+                raise ValueError(
+                    f"Clip cache in {clip_cache.root} was built with "
+                    f"{clip_cache.metadata}, which does not match "
+                    f"{self._clip_cache_metadata()}"
+                )
+            self._clip_cache = clip_cache
+        return self._clip_cache
+
+    def _cached_youtube_features(
+        self, input_dict: dict[str, Any], decode_request: dict[str, Any]
+    ) -> dict[str, Any] | None:
+        if not self.config.use_clip_cache:
+            return None
+        clip = self._get_clip_cache().get(input_dict[TALIKeys.item_idx.value])
+        if clip is None:
+            return None
+
+        youtube_features = {}
+        for name in ("video", "image", "audio"):
+            if not decode_request[f"return_{name}"]:
+                continue
+            if name not in clip:
+                return None
+            youtube_features[name] = (
+                format_video_frames(
+                    clip[name],
+                    self.config.video_frames_format,
+                    self.config.video_frames_uint8,
+                )
+                if name != "audio"
+                else clip[name]
+            )
+        youtube_features["starting_second"] = float(clip["starting_second"])
+        return youtube_features
+
+    def _decode_youtube_features(self, input_dict: dict[str, Any]):
+        decode_request = self._youtube_decode_request(input_dict)
+        if decode_request is None:
+            return {}
+        youtube_features = self._cached_youtube_features(
+            input_dict, decode_request
+        )
+        if youtube_features is not None:
+            return youtube_features
+        return self.video_transform(**decode_request)
+
+    def _run_decode_requests(
+        self,
+        decode_requests: list[dict[str, Any] | None],
+        video_loader: Callable,
+    ):
+        num_clips = sum(request is not None for request in decode_requests)
+        if self.config.num_decode_workers <= 0 or num_clips <= 1:
+            return [
+                video_loader(**request) if request is not None else {}
+                for request in decode_requests
+            ]
+
+        executor = self._get_decode_executor()
+        futures = [
+            (
+                executor.submit(video_loader, **request)
+                if request is not None
+                else None
+            )
+            for request in decode_requests
+        ]
+        return [
+            future.result() if future is not None else {} for future in futures
+        ]
+
+    def _decode_youtube_features_batch(self, samples: list[dict[str, Any]]):
+        """Decodes the clips of a batch, on the decode executor when
+        ``config.num_decode_workers`` is set. Every clip is seeded by its
+        own ``item_idx``, so results do not depend on scheduling."""
+        decode_requests = [
+            self._youtube_decode_request(sample) for sample in samples
+        ]
+        youtube_features = [
+            (
+                self._cached_youtube_features(sample, request)
+                if request is not None
+                else {}
+            )
+            for sample, request in zip(samples, decode_requests)
+        ]
+        decoded_features = self._run_decode_requests(
+            [
+                request if features is None else None
+                for request, features in zip(decode_requests, youtube_features)
+            ],
+            self.video_transform,
+        )
+        return [
+            features if features is not None else decoded
+            for features, decoded in zip(youtube_features, decoded_features)
+        ]
+
+    def build_clip_cache(
+        self,
+        dataset: datasets.Dataset,
+        split_name: str = "train",
+        shard_size: int = 1024,
+        batch_size: int = 64,
+    ) -> pathlib.Path:
+        """Decodes every clip of a split once into memory-mapped shards.
+
+        Clips are decoded exactly as this transform would decode them,
+        with uint8 frames and 16 kHz audio, and written under
+        ``cache_dir / "clips" / split_name``. With ``config.use_clip_cache``
+        the transform then reads clips from there instead of decoding them.
+        Since clips are seeded by ``item_idx``, cached clips are identical
+        to freshly decoded ones.
+
+        Args:
+            dataset (datasets.Dataset): A TALI split.
+            split_name (str): Name of the cache subdirectory.
+            shard_size (int): Number of clips per shard file.
+            batch_size (int): Number of clips decoded at once, on the decode
+                executor when ``config.num_decode_workers`` is set.
+
+        Returns:
+            pathlib.Path: The directory the shards were written to.
+        """
+        video_loader = functools.partial(
+            load_video_clip,
+            config=replace(
+                self.config,
+                video_frames_format=VideoFramesFormat.TENSOR.value,
+                video_frames_uint8=True,
+            ),
+        )
+        clip_cache_path = pathlib.Path(self.cache_dir) / "clips" / split_name
+        writer = ClipCacheWriter(
+            root=clip_cache_path,
+            num_items=len(dataset),
+            metadata=self._clip_cache_metadata(),
+            shard_size=shard_size,
+        )
+        dataset = dataset.select_columns(
+            [TALIKeys.item_idx.value, TALIKeys.youtube_video_content.value]
+        )
+
+        from tqdm import tqdm
+
+        for start in tqdm(
+            range(0, len(dataset), batch_size), desc="Caching clips"
+        ):
+            batch = dataset[start : start + batch_size]
+            samples = [
+                {key: batch[key][idx] for key in batch}
+                for idx in range(len(batch[TALIKeys.item_idx.value]))
+            ]
+            clips = self._run_decode_requests(
+                [self._youtube_decode_request(sample) for sample in samples],
+                video_loader,
+            )
+            for sample, clip in zip(samples, clips):
+                writer.write(sample[TALIKeys.item_idx.value], clip)
+
+        writer.close()
+        return clip_cache_path
+
+    def _apply_transform(
+        self,
+        input_dict: dict[str, Any],
+        tokenize: bool = True,
+        youtube_features: dict[str, Any] | None = None,
+    ):
         output_dict = {}
 
         output_dict[TALIKeys.wit_idx.value] = [
@@ -743,55 +2322,142 @@ class TALIBaseTransform:
             input_dict[TALIKeys.item_idx.value]
         ]
 
-        youtube_video = None
-        youtube_audio = None
-        youtube_image = None
-        if SubModalityTypes.youtube_content_video in self.config.modality_list:
-            youtube_features = self.video_transform(
-                x=input_dict[TALIKeys.youtube_video_content.value],
-                start=0,
-                end=30,
-                seed=int(input_dict[TALIKeys.item_idx.value]),
-                return_video=True,
-                return_audio=SubModalityTypes.youtube_content_audio.value
-                in self.config.modality_list,
-                return_image=SubModalityTypes.youtube_random_video_frame.value
-                in self.config.modality_list,
-            )
-            youtube_video = youtube_features["video"]
-            youtube_audio = (
-                youtube_features["audio"]
-                if "audio" in youtube_features
-                else None
+        if youtube_features is None:
+            with profile_stage("decode"):
+                youtube_features = self._decode_youtube_features(input_dict)
+        youtube_video = youtube_features.get("video")
+        youtube_audio = youtube_features.get("audio")
+        youtube_image = youtube_features.get("image")
+
+        with profile_stage("text"):
+            output_dict.update(
+                self._process_text(
+                    input_dict=input_dict,
+                    tokenize=tokenize,
+                    clip_starting_second=youtube_features.get(
+                        "starting_second"
+                    ),
+                )
             )
-            youtube_image = (
-                youtube_features["image"]
-                if "image" in youtube_features
-                else None
+        with profile_stage("audio"):
+            output_dict.update(
+                self._process_audio(
+                    input_dict=input_dict,
+                    audio=youtube_audio,
+                    tokenize=tokenize,
+                )
             )
-
-        output_dict.update(self._process_text(input_dict=input_dict))
-        output_dict.update(
-            self._process_audio(
-                input_dict=input_dict,
-                audio=youtube_audio,
+        with profile_stage("image"):
+            output_dict.update(
+                self._process_image(
+                    input_dict=input_dict,
+                    image=youtube_image,
+                    tokenize=tokenize,
+                )
             )
-        )
-        output_dict.update(
-            self._process_image(
-                input_dict=input_dict,
-                image=youtube_image,
+        with profile_stage("video"):
+            output_dict.update(
+                self._process_video(
+                    input_dict=input_dict,
+                    video=youtube_video,
+                    tokenize=tokenize,
+                )
             )
-        )
-        output_dict.update(
-            self._process_video(
-                input_dict=input_dict,
-                video=youtube_video,
-            )
-        )
 
         return output_dict
 
+    def _tokenize_batch(self, output_dict: dict[str, list], batch_size: int):
+        text_keys = [
+            sub_modality.value.name
+            for sub_modality in SubModalityTypes
+            if sub_modality.value.parent == ModalityTypes.text
+        ]
+        image_keys = [
+            SubModalityTypes.youtube_random_video_frame.value.name,
+            SubModalityTypes.wikipedia_caption_image.value.name,
+        ]
+        audio_key = SubModalityTypes.youtube_content_audio.value.name
+        video_key = SubModalityTypes.youtube_content_video.value.name
+
+        for key, values in output_dict.items():
+            if key in text_keys and self.text_tokenizer is not None:
+                if all(isinstance(value, str) for value in values):
+                    output_dict[key] = _with_batch_dim(
+                        self.text_tokenizer(values), batch_size
+                    )
+                elif all(isinstance(value, torch.Tensor) for value in values):
+                    output_dict[key] = torch.nn.utils.rnn.pad_sequence(
+                        values,
+                        batch_first=True,
+                        padding_value=self.config.text_padding_value,
+                    )
+                else:
+                    output_dict[key] = [
+                        self._tokenize_text(value) for value in values
+                    ]
+            elif key in image_keys and self.image_tokenizer is not None:
+                output_dict[key] = _with_batch_dim(
+                    self.image_tokenizer(values), batch_size
+                )
+            elif key == audio_key:
+                # Each sample's audio is a one-element tuple of waveforms,
+                # so a batch is a stack of the first (and only) element
+                waveforms = torch.stack([value[0] for value in values])
+                output_dict[key] = (
+                    self.audio_tokenizer(waveforms)
+                    if self.audio_tokenizer is not None
+                    else waveforms
+                )
+            elif key == video_key and self.video_tokenizer is not None:
+                num_frames = [len(value) for value in values]
+                frames = self.video_tokenizer(
+                    [frame for value in values for frame in value]
+                )
+                output_dict[key] = (
+                    frames.view(batch_size, num_frames[0], *frames.shape[1:])
+                    if len(set(num_frames)) == 1
+                    else list(frames.split(num_frames))
+                )
+            else:
+                output_dict[key] = _collate(values)
+
+        return output_dict
+
+    def _apply_transform_batch(self, input_dict: dict[str, list]):
+        batch_size = len(input_dict[TALIKeys.item_idx.value])
+        samples = [
+            {key: input_dict[key][idx] for key in input_dict}
+            for idx in range(batch_size)
+        ]
+        with profile_stage("decode"):
+            youtube_features = self._decode_youtube_features_batch(samples)
+        samples = [
+            self._apply_transform(
+                sample,
+                tokenize=not self.config.collate_batches,
+                youtube_features=sample_youtube_features,
+            )
+            for sample, sample_youtube_features in zip(
+                samples, youtube_features
+            )
+        ]
+
+        if not self.config.collate_batches:
+            output_dict = defaultdict(list)
+            for output_dict_ in samples:
+                for key in output_dict_.keys():
+                    output_dict[key].append(output_dict_[key])
+            return output_dict
+
+        output_dict = {
+            key: [sample[key] for sample in samples] for key in samples[0]
+        }
+        for key in (TALIKeys.wit_idx.value, TALIKeys.item_idx.value):
+            output_dict[key] = [value[0] for value in output_dict[key]]
+
+        with profile_stage("tokenize"):
+            return self._tokenize_batch(output_dict, batch_size)
+
     def __call__(self, input_dict: dict[str, Any]) -> dict[str, Any]:
         """Wrapper function for the transform function.
 
@@ -804,33 +2470,55 @@ class TALIBaseTransform:
                 'wit_features', 'wit_idx', 'youtube_content_video',
                 'youtube_subtitle_text', 'youtube_title_text',
                 'youtube_description_text'])
+            Values are lists for a batch. With ``config.collate_batches``
+            each tokenizer is called once for the whole batch, on a list of
+            strings, images or video frames, or on a ``(B, T)`` stack of
+            waveforms, and returns batched tensors. With
+            ``config.num_decode_workers`` the clips of a batch are decoded
+            concurrently on a thread or process pool. With
+            ``config.profile`` the time spent in every stage is recorded on
+            tali.profiling.PROFILER and, given a ``profiling_sink``, pushed
+            to it after every call so that stages recorded in DataLoader
+            workers reach the main process.
 
         Returns:
-            Dict[str, Any]: The transformed dictionary.
+            Dict[str, Any]: The transformed dictionary. For a batch with
+            ``config.collate_batches`` this is a dict of batched tensors
+            where shapes allow, ready to be consumed by a DataLoader.
         """
 
-        if isinstance(input_dict["item_idx"], list):
-            output_dict = defaultdict(list)
-            for idx in range(len(input_dict["item_idx"])):
-                input_dict_ = {key: input_dict[key][idx] for key in input_dict}
-                output_dict_ = self._apply_transform(input_dict_)
-                for key in output_dict_.keys():
-                    output_dict[key].append(output_dict_[key])
-        else:
-            output_dict = self._apply_transform(input_dict)
+        if self.config.profile:
+            enable_profiling()
+
+        with profile_stage("transform"):
+            if isinstance(input_dict["item_idx"], list):
+                output_dict = self._apply_transform_batch(input_dict)
+            else:
+                output_dict = self._apply_transform(input_dict)
+
+        if self.config.profile and self.profiling_sink is not None:
+            self.profiling_sink.push()
 
         return output_dict
 
 
 if __name__ == "__main__":
-    import torch
+    import tempfile
+
+    from rich.traceback import install
+    from tqdm import tqdm
+
+    install()
 
-    dataset_path = pathlib.Path("/home/antreas/datasets")
-    dataset_cache = pathlib.Path("/mnt/nvme-fast0/datasets")
-    dataset_dict = load_dataset_via_hub(
-        dataset_download_path=dataset_path,
+    from tali.synthetic import SyntheticDatasetConfig, write_synthetic_dataset
+
+    dataset_cache = pathlib.Path(tempfile.mkdtemp())
+    dataset_path = write_synthetic_dataset(
+        dataset_cache / "data", SyntheticDatasetConfig(num_rows=4)
+    )
+    dataset_dict = load_dataset_from_parquet(
+        dataset_path=dataset_path,
         dataset_cache_path=dataset_cache / "tali",
-        dataset_name="Antreas/TALI",
     )
 
     (
@@ -867,7 +2555,6 @@ if __name__ == "__main__":
     dataset_dict.set_transform(demo_transform)
 
     for sample in tqdm(dataset_dict["test"]):
-        sample = demo_transform(sample)
         print(list(sample.keys()))
         for key, value in sample.items():
             if hasattr(value, "shape") or isinstance(value, torch.Tensor):
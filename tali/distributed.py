@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import contextlib
+import os
+
+from tali.utils import lazy_import
+
+datasets = lazy_import("datasets")
+torch = lazy_import("torch")
+
+
+def get_rank_and_world_size(
+    rank: int | None = None, world_size: int | None = None
+) -> tuple[int, int]:
+    """Resolves this process's rank and the world size.
+
+    Explicit arguments win, then an initialised ``torch.distributed``
+    process group, then the ``RANK`` and ``WORLD_SIZE`` environment
+    variables set by ``torchrun``, and finally a single process.
+    """
+    if rank is not None and world_size is not None:
+        return rank, world_size
+
+    if torch.distributed.is_available() and torch.distributed.is_initialized():
+        return (
+            torch.distributed.get_rank() if rank is None else rank,
+            (
+                torch.distributed.get_world_size()
+                if world_size is None
+                else world_size
+            ),
+        )
+
+    return (
+        int(os.environ.get("RANK", 0)) if rank is None else rank,
+        (
+            int(os.environ.get("WORLD_SIZE", 1))
+            if world_size is None
+            else world_size
+        ),
+    )
+
+
+def get_local_rank() -> int:
+    return int(os.environ.get("LOCAL_RANK", 0))
+
+
+def assign_shards_to_rank(
+    shards: list[tuple[str, int]], rank: int, world_size: int
+) -> list[tuple[str, int]]:
+    """Assigns whole shards to ranks so their byte totals are balanced.
+
+    Shards are handed out largest first, each to the rank with the fewest
+    bytes so far. Shard sizes are dominated by the ``youtube_video_content``
+    payload, so this also balances the decoding work. Every rank computes
+    the same assignment from the same listing.
+
+    Args:
+        shards (list[tuple[str, int]]): ``(path, size_in_bytes)`` per shard.
+        rank (int): The rank to return the shards of.
+        world_size (int): The number of ranks.
+
+    Returns:
+        list[tuple[str, int]]: The rank's shards, in their original order.
+    """
+    rank_sizes = [0] * world_size
+    rank_shards = [[] for _ in range(world_size)]
+    for path, size in sorted(shards, key=lambda shard: (-shard[1], shard[0])):
+        target_rank = min(range(world_size), key=rank_sizes.__getitem__)
+        rank_shards[target_rank].append(path)
+        rank_sizes[target_rank] += size
+
+    assigned = set(rank_shards[rank])
+    return [shard for shard in shards if shard[0] in assigned]
+
+
+def max_num_rows_across_ranks(num_rows: int) -> int:
+    """The largest ``num_rows`` of any rank, ``num_rows`` itself when no
+    process group is initialised."""
+    if not (
+        torch.distributed.is_available() and torch.distributed.is_initialized()
+    ):
+        return num_rows
+
+    num_rows = torch.tensor(num_rows, dtype=torch.int64)
+    if torch.distributed.get_backend() == "nccl":
+        num_rows = num_rows.cuda()
+    torch.distributed.all_reduce(num_rows, op=torch.distributed.ReduceOp.MAX)
+    return int(num_rows.item())
+
+
+def pad_dataset_to_num_rows(
+    dataset: datasets.Dataset, num_rows: int
+) -> datasets.Dataset:
+    """Repeats rows from the start of ``dataset`` until it has
+    ``num_rows``, so every rank runs the same number of steps."""
+    if len(dataset) == 0 or len(dataset) >= num_rows:
+        return dataset
+    return dataset.select([idx % len(dataset) for idx in range(num_rows)])
+
+
+@contextlib.contextmanager
+def local_main_process_first():
+    """Runs the body on local rank 0 before the other ranks of its node.
+
+    Work the other ranks repeat afterwards, such as building a ``datasets``
+    cache on a shared disk, then finds its results in place. A no-op
+    without an initialised process group.
+    """
+    distributed = (
+        torch.distributed.is_available() and torch.distributed.is_initialized()
+    )
+    if distributed and get_local_rank() != 0:
+        torch.distributed.barrier()
+    try:
+        yield
+    finally:
+        if distributed and get_local_rank() == 0:
+            torch.distributed.barrier()
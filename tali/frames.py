@@ -1,12 +1,19 @@
+from __future__ import annotations
+
+import bisect
 import contextlib
 import functools
 import io
 import os
 import time
 
-import av
 import numpy as np
-import torch
+
+from tali.profiling import profile_stage, record_count
+from tali.utils import lazy_import
+
+av = lazy_import("av")
+torch = lazy_import("torch")
 
 
 class FrameSelectionMethod:
@@ -19,6 +26,22 @@ class FrameSelectionMethod:
     SEQUENTIAL: str = "sequential"
 
 
+class VideoDecodingMode:
+    """
+    Enum-like class for how much of a clip's video is decoded 🔑
+
+    ALL_FRAMES decodes up to the exact selected frames. KEYFRAMES only
+    decodes the keyframes within the clip and selects among them.
+    KEYFRAME_SEEKED seeks to the keyframe before each selected timestamp,
+    unless its GOP is already being decoded, and keeps the frame nearest
+    to it.
+    """
+
+    ALL_FRAMES: str = "all_frames"
+    KEYFRAMES: str = "keyframes"  # 🔑
+    KEYFRAME_SEEKED: str = "keyframe_seeked"  # ⏩🔑
+
+
 def seek_to_second(container, stream, second):
     # Convert the second to the stream's time base
     timestamp = int(
@@ -53,6 +76,327 @@ def suppress_stderr(func):
     return wrapper
 
 
+@suppress_stderr
+def probe_clip_window(
+    video_data: str | bytes,
+    starting_second: float,
+    ending_second: float | None,
+    clip_duration_in_seconds: float,
+    rng: np.random.Generator,
+) -> tuple[float, float]:
+    """The window extract_clip_pyav would draw with the same ``rng``,
+    read from the container's metadata without decoding any frames."""
+    video_source = (
+        io.BytesIO(video_data) if isinstance(video_data, bytes) else video_data
+    )
+    with av.open(video_source) as container:
+        duration = container_duration_in_seconds(container)
+    return select_clip_window(
+        starting_second=starting_second,
+        ending_second=ending_second,
+        clip_duration_in_seconds=clip_duration_in_seconds,
+        duration=duration,
+        rng=rng,
+    )
+
+
+def frames_per_second(stream) -> float | None:
+    rate = stream.average_rate or stream.guessed_rate
+    return float(rate) if rate else None
+
+
+def stream_duration_in_seconds(container, stream) -> float | None:
+    if stream.duration is not None:
+        return duration_in_seconds(stream)
+    if container.duration is not None:
+        return float(container.duration / av.time_base)
+    return None
+
+
+def container_duration_in_seconds(container) -> float | None:
+    """Duration of the first video stream, or else the first stream, from
+    the container's metadata."""
+    stream = next(
+        (s for s in container.streams if s.type == "video"),
+        next(iter(container.streams), None),
+    )
+    if stream is None:
+        return None
+    return stream_duration_in_seconds(container, stream)
+
+
+def select_clip_window(
+    starting_second: float,
+    ending_second: float | None,
+    clip_duration_in_seconds: float,
+    duration: float | None,
+    rng: np.random.Generator,
+) -> tuple[float, float]:
+    """Draws a ``clip_duration_in_seconds`` long window 🎲
+
+    The window lies between ``starting_second`` and ``ending_second``,
+    capped by the video's ``duration``, and starts at ``starting_second``
+    when the clip is too short to hold it. Exactly one number is drawn
+    from ``rng`` either way, so the frame selection that follows does not
+    depend on the video's length.
+
+    Returns:
+        The ``(starting_second, ending_second)`` of the window.
+    """
+    if duration is not None:
+        ending_second = (
+            duration if ending_second is None else min(ending_second, duration)
+        )
+    latest_start = (
+        max(ending_second - clip_duration_in_seconds, starting_second)
+        if ending_second is not None
+        else starting_second
+    )
+    clip_starting_second = float(rng.uniform(starting_second, latest_start))
+    return (
+        clip_starting_second,
+        clip_starting_second + clip_duration_in_seconds,
+    )
+
+
+def select_frame_indices(
+    num_available_frames: int,
+    num_frames: int,
+    rng: np.random.Generator,
+    frame_selection_method: str,
+    replace: bool = False,
+) -> list[int]:
+    """Picks which of the available frames to keep 🎯
+
+    Shared by the decode-everything and the planned decoding paths, so that
+    the same rng produces the same selection in both.
+
+    Args:
+        num_available_frames (int): Number of frames in the clip.
+        num_frames (int): Number of frames wanted.
+        rng (np.random.Generator): Random number generator for RANDOM.
+        frame_selection_method (str): One of FrameSelectionMethod.
+        replace (bool): Whether RANDOM may pick the same frame twice.
+
+    Returns:
+        Sorted, de-duplicated frame indices.
+    """
+    num_selected_frames = min(int(num_frames), num_available_frames)
+    if frame_selection_method == FrameSelectionMethod.RANDOM:
+        frame_indices = rng.choice(
+            num_available_frames,
+            num_selected_frames,
+            replace=replace,
+        )
+    elif frame_selection_method == FrameSelectionMethod.UNIFORM:
+        frame_indices = np.linspace(
+            0,
+            num_available_frames,
+            num_selected_frames,
+            endpoint=False,
+            dtype=int,
+        )
+    elif frame_selection_method == FrameSelectionMethod.SEQUENTIAL:
+        frame_indices = np.arange(0, num_selected_frames)
+    else:
+        raise ValueError(
+            f"Unknown frame selection method {frame_selection_method}"
+        )
+
+    return sorted({int(index) for index in frame_indices})
+
+
+def repeat_to_num_frames(
+    frames: torch.Tensor, num_frames: int
+) -> torch.Tensor:
+    """Repeats frames evenly, in order, when a clip has fewer than
+    ``num_frames`` to choose from."""
+    if len(frames) == 0 or len(frames) >= num_frames:
+        return frames
+    return frames[
+        np.linspace(0, len(frames), num_frames, endpoint=False, dtype=int)
+    ]
+
+
+def scaled_frame_size(
+    width: int, height: int, shorter_side: int | None
+) -> tuple[int, int]:
+    """Width and height with the shorter side scaled to ``shorter_side``,
+    rounded the same way as torchvision's ``Resize(int)``."""
+    if shorter_side is None or min(width, height) == shorter_side:
+        return width, height
+    if width <= height:
+        return shorter_side, int(shorter_side * height / width)
+    return int(shorter_side * width / height), shorter_side
+
+
+def frame_to_tensor(
+    frame,
+    modality: str,
+    stereo_audio_if_available: bool = False,
+    resize_shorter_side_to: int | None = None,
+) -> torch.Tensor:
+    if modality == "video":
+        # Scaling happens in the same swscale pass as the rgb24 conversion,
+        # so full resolution frames never reach torch
+        width, height = scaled_frame_size(
+            frame.width, frame.height, resize_shorter_side_to
+        )
+        with profile_stage("colour_conversion"):
+            array_frame = torch.from_numpy(
+                frame.to_ndarray(format="rgb24", width=width, height=height)
+            )
+        if len(array_frame.shape) == 2:
+            array_frame = array_frame.unsqueeze(0)
+        return array_frame
+
+    array_frame = torch.from_numpy(frame.to_ndarray())
+    if not stereo_audio_if_available:
+        array_frame = array_frame[0].unsqueeze(0)
+    return array_frame
+
+
+def plan_video_frames(
+    container,
+    stream,
+    starting_second: float,
+    ending_second: float,
+    num_frames: int,
+    rng: np.random.Generator,
+    frame_selection_method: str,
+    single_image_frame: bool = False,
+) -> tuple[float, list[int]] | None:
+    """Chooses the frames to keep from stream metadata alone 🗺
+
+    Frame slots are counted from ``starting_second`` at the stream's
+    average frame rate.
+
+    Returns:
+        A ``(fps, slots)`` tuple, or None if the stream does not carry
+        enough metadata to plan without decoding.
+    """
+    fps = frames_per_second(stream)
+    if fps is None:
+        return None
+
+    clip_ending_second = ending_second
+    duration = stream_duration_in_seconds(container, stream)
+    if duration is not None:
+        clip_ending_second = min(clip_ending_second, duration)
+
+    num_available_frames = int(
+        np.floor((clip_ending_second - starting_second) * fps)
+    )
+    if num_available_frames <= 0:
+        return None
+
+    if single_image_frame:
+        return fps, [0]
+
+    return fps, select_frame_indices(
+        num_available_frames=num_available_frames,
+        num_frames=num_frames,
+        rng=rng,
+        frame_selection_method=frame_selection_method,
+    )
+
+
+def keyframe_timestamps(
+    container, stream, starting_second: float, ending_second: float
+) -> list[float]:
+    """Timestamps of the keyframes from the one before ``starting_second``
+    to ``ending_second``, read from packet headers without decoding 🔑"""
+    container = seek_to_second(container, stream, starting_second)
+    timestamps = []
+    for packet in container.demux(stream):
+        if packet.pts is None or not packet.is_keyframe:
+            continue
+        timestamp = float(packet.pts * stream.time_base)
+        if timestamp > ending_second:
+            break
+        timestamps.append(timestamp)
+    return sorted(timestamps)
+
+
+def decode_planned_video_frames(
+    container,
+    stream,
+    starting_second: float,
+    ending_second: float,
+    fps: float,
+    slots: list[int],
+    seek_threshold_in_seconds: float = 2.0,
+    resize_shorter_side_to: int | None = None,
+    nearest_keyframe: bool = False,
+) -> list[torch.Tensor]:
+    """Decodes just far enough to reach each planned frame slot ⏩
+
+    Seeks to the keyframe before the first slot, and seeks again whenever
+    the next slot is more than ``seek_threshold_in_seconds`` ahead of the
+    last decoded frame. Only frames that fill a slot are colour converted.
+
+    With ``nearest_keyframe`` the seeks follow the GOPs instead, from a
+    keyframe index read off the packet headers. A slot is seeked to only
+    when its GOP starts after the last decoded frame, so a GOP is decoded
+    at most once, and is filled by the frame nearest to it that no earlier
+    slot took.
+    """
+    frames = []
+    frame_iterator = None
+    last_timestamp = None
+    num_decoded_frames = 0
+    taken_timestamps = set()
+    keyframes = (
+        keyframe_timestamps(container, stream, starting_second, ending_second)
+        if nearest_keyframe
+        else None
+    )
+
+    for slot in slots:
+        target_timestamp = starting_second + slot / fps
+        if frame_iterator is None:
+            seek = True
+        elif nearest_keyframe:
+            gop_idx = bisect.bisect_right(keyframes, target_timestamp) - 1
+            seek = gop_idx >= 0 and keyframes[gop_idx] > last_timestamp
+        else:
+            seek = (
+                target_timestamp - last_timestamp > seek_threshold_in_seconds
+            )
+        if seek:
+            container = seek_to_second(container, stream, target_timestamp)
+            frame_iterator = container.decode(stream)
+
+        for frame in frame_iterator:
+            num_decoded_frames += 1
+            last_timestamp = frame_timestamp_in_seconds(frame, stream)
+            if nearest_keyframe and (
+                last_timestamp in taken_timestamps
+                or last_timestamp < starting_second
+                or last_timestamp < target_timestamp - 0.5 / fps
+            ):
+                continue
+            if (
+                nearest_keyframe
+                or round((last_timestamp - starting_second) * fps) >= slot
+            ):
+                taken_timestamps.add(last_timestamp)
+                if last_timestamp <= ending_second:
+                    frames.append(
+                        frame_to_tensor(
+                            frame,
+                            "video",
+                            resize_shorter_side_to=resize_shorter_side_to,
+                        )
+                    )
+                break
+        else:
+            break
+
+    record_count("video_frames_decoded", num_decoded_frames)
+    return frames
+
+
 @suppress_stderr
 def extract_frames_pyav(
     video_data: str | bytes,
@@ -61,12 +405,41 @@ def extract_frames_pyav(
     ending_second: float,
     num_frames: int,
     rng: np.random.Generator,
-    frame_selection_method: str = "RANDOM",
+    frame_selection_method: str = FrameSelectionMethod.RANDOM,
     key_frames_only: bool = False,
     stereo_audio_if_available: bool = False,
     single_image_frame: bool = False,
+    plan_frames: bool = True,
+    seek_threshold_in_seconds: float = 2.0,
+    resize_shorter_side_to: int | None = None,
+    decoding_mode: str = VideoDecodingMode.ALL_FRAMES,
 ) -> torch.Tensor:
+    """Extracts video frames or audio samples from a clip 🎬
+
+    With ``plan_frames`` the video frames to keep are chosen from stream
+    metadata before decoding, and only those frames are decoded up to and
+    colour converted. Sequential audio stops decoding once enough samples
+    have been collected. Otherwise every frame between ``starting_second``
+    and ``ending_second`` is decoded and the selection is made afterwards.
+    ``resize_shorter_side_to`` scales video frames during colour conversion.
+
+    ``decoding_mode`` is one of VideoDecodingMode, ``key_frames_only`` is
+    the same as VideoDecodingMode.KEYFRAMES. In both keyframe modes video
+    frames are distinct and only repeated when the clip has fewer than
+    ``num_frames``.
+
+    Returns:
+        ``(num_frames, H, W, C)`` uint8 video frames or
+        ``(num_samples, channels)`` audio samples.
+    """
     frame_dict = {}
+    if key_frames_only:
+        decoding_mode = VideoDecodingMode.KEYFRAMES
+    repeat_frames = (
+        modality == "video"
+        and decoding_mode != VideoDecodingMode.ALL_FRAMES
+        and not single_image_frame
+    )
 
     video_source = (
         io.BytesIO(video_data) if isinstance(video_data, bytes) else video_data
@@ -74,70 +447,483 @@ def extract_frames_pyav(
 
     with av.open(video_source) as container:
         stream = next(s for s in container.streams if s.type == modality)
-        if key_frames_only:
+        if decoding_mode == VideoDecodingMode.KEYFRAMES:
             stream.codec_context.skip_frame = "NONKEY"
 
+        plan = (
+            plan_video_frames(
+                container=container,
+                stream=stream,
+                starting_second=starting_second,
+                ending_second=ending_second,
+                num_frames=num_frames,
+                rng=rng,
+                frame_selection_method=frame_selection_method,
+                single_image_frame=single_image_frame,
+            )
+            if modality == "video"
+            and decoding_mode != VideoDecodingMode.KEYFRAMES
+            and (
+                plan_frames
+                or decoding_mode == VideoDecodingMode.KEYFRAME_SEEKED
+            )
+            else None
+        )
+
+        if plan is not None:
+            fps, slots = plan
+            frames = decode_planned_video_frames(
+                container=container,
+                stream=stream,
+                starting_second=starting_second,
+                ending_second=ending_second,
+                fps=fps,
+                slots=slots,
+                seek_threshold_in_seconds=seek_threshold_in_seconds,
+                resize_shorter_side_to=resize_shorter_side_to,
+                nearest_keyframe=(
+                    decoding_mode == VideoDecodingMode.KEYFRAME_SEEKED
+                ),
+            )
+            if len(frames) > 0:
+                frames = torch.stack(frames)
+                if repeat_frames:
+                    frames = repeat_to_num_frames(frames, num_frames)
+                record_count("video_frames_kept", len(frames))
+                return frames
+
+        stop_after_num_samples = (
+            num_frames
+            if plan_frames
+            and modality == "audio"
+            and frame_selection_method == FrameSelectionMethod.SEQUENTIAL
+            else None
+        )
+        num_samples = 0
+
         container = seek_to_second(container, stream, starting_second)
+        earlier_keyframe = None
 
         for frame in container.decode(stream):
+            record_count(f"{modality}_frames_decoded")
             # logger.info(f"Frame timestamp: {frame}")
             frame_timestamp = frame_timestamp_in_seconds(frame, stream)
             # logger.info(f"Frame timestamp: {frame_timestamp}")
-            if modality == "video":
-                array_frame = frame.to_ndarray(format="rgb24")
-            else:
-                array_frame = frame.to_ndarray()
-
-            array_frame = torch.from_numpy(array_frame)
-
-            if modality == "video" and len(array_frame.shape) == 2:
-                array_frame = array_frame.unsqueeze(0)
-
-            if modality == "audio" and not stereo_audio_if_available:
-                array_frame = array_frame[0].unsqueeze(0)
-
             if frame_timestamp > ending_second:
                 break
+            if (
+                decoding_mode == VideoDecodingMode.KEYFRAMES
+                and frame_timestamp < starting_second
+            ):
+                # The seek lands on the keyframe before the clip, only kept
+                # when the clip holds no keyframe of its own
+                earlier_keyframe = frame
+                continue
+
+            array_frame = frame_to_tensor(
+                frame,
+                modality,
+                stereo_audio_if_available,
+                resize_shorter_side_to,
+            )
             frame_dict[frame_timestamp] = array_frame
             # logger.info(f"Frame dict: {frame_dict}")
             if single_image_frame:
                 break
 
+            if stop_after_num_samples is not None:
+                num_samples += array_frame.shape[1]
+                if num_samples >= stop_after_num_samples:
+                    break
+
+        if len(frame_dict) == 0 and earlier_keyframe is not None:
+            frame_dict[
+                frame_timestamp_in_seconds(earlier_keyframe, stream)
+            ] = frame_to_tensor(
+                earlier_keyframe,
+                modality,
+                resize_shorter_side_to=resize_shorter_side_to,
+            )
+
     frame_values = (
         torch.stack(list(frame_dict.values()))
         if modality == "video"
         else torch.cat(list(frame_dict.values()), dim=1).permute(1, 0)
     )
 
-    if frame_selection_method == FrameSelectionMethod.RANDOM:
-        frame_indices = rng.choice(
-            len(frame_values),
-            min(num_frames, len(frame_values)),
-            replace=key_frames_only,
-        )
-    elif frame_selection_method == FrameSelectionMethod.UNIFORM:
-        frame_indices = np.linspace(
-            0,
-            len(frame_values),
-            min(num_frames, len(frame_values)),
-            endpoint=False,
-            dtype=int,
-        )
-    elif frame_selection_method == FrameSelectionMethod.SEQUENTIAL:
-        frame_indices = np.arange(0, min(num_frames, len(frame_values)))
-
-    frame_indices = sorted(set(frame_indices))
+    frame_indices = select_frame_indices(
+        num_available_frames=len(frame_values),
+        num_frames=num_frames,
+        rng=rng,
+        frame_selection_method=frame_selection_method,
+    )
     output = frame_values[frame_indices]
 
     if modality == "video" and len(output.shape) == 3:
         output = output.unsqueeze(0)
+    if repeat_frames:
+        output = repeat_to_num_frames(output, num_frames)
+    record_count(f"{modality}_frames_kept", len(output))
+
+    return output
+
+
+def _first_stream(container, modality: str):
+    return next((s for s in container.streams if s.type == modality), None)
+
+
+@suppress_stderr
+def extract_clip_pyav(
+    video_data: str | bytes,
+    starting_second: float,
+    ending_second: float,
+    rng: np.random.Generator,
+    num_video_frames: int = 0,
+    audio_duration_in_seconds: float = 0.0,
+    return_video: bool = True,
+    return_image: bool = False,
+    return_audio: bool = False,
+    frame_selection_method: str = FrameSelectionMethod.RANDOM,
+    stereo_audio_if_available: bool = False,
+    seek_threshold_in_seconds: float = 2.0,
+    resize_shorter_side_to: int | None = None,
+    audio_sample_rate: int | None = None,
+    decoding_mode: str = VideoDecodingMode.ALL_FRAMES,
+    clip_duration_in_seconds: float | None = None,
+) -> dict[str, torch.Tensor | int | float]:
+    """Extracts video frames, an image frame and audio in one pass 🎞🔊
+
+    The container is opened and seeked once. Video and audio packets are
+    demuxed together and each is decoded by its own stream's decoder, so
+    no byte of the clip is parsed twice. When both video and image are
+    requested the image is the first of ``num_video_frames + 1`` selected
+    frames, otherwise it is the first frame of the clip.
+
+    With VideoDecodingMode.KEYFRAME_SEEKED the video frames are seeked to
+    one by one before the audio is demuxed on its own.
+
+    With ``clip_duration_in_seconds`` only a window of that length, drawn
+    with ``rng`` between ``starting_second`` and ``ending_second`` from the
+    container's metadata, is decoded, see select_clip_window.
+
+    Args:
+        video_data (str | bytes): Path to, or bytes of, the video file.
+        starting_second (float): Start of the clip in seconds.
+        ending_second (float): End of the clip in seconds.
+        rng (np.random.Generator): Random number generator for RANDOM.
+        num_video_frames (int): Number of video frames to extract.
+        audio_duration_in_seconds (float): Length of audio to extract.
+        return_video (bool): Whether to return video frames.
+        return_image (bool): Whether to return an image frame.
+        return_audio (bool): Whether to return audio samples.
+        frame_selection_method (str): One of FrameSelectionMethod.
+        stereo_audio_if_available (bool): Keep all audio channels.
+        seek_threshold_in_seconds (float): Gap between planned video frames
+            above which a video-only extraction seeks instead of decoding
+            through.
+        resize_shorter_side_to (int | None): Scale video frames so their
+            shorter side has this length while converting them to rgb24.
+        audio_sample_rate (int | None): Resample, and downmix unless stereo
+            is kept, with PyAV's AudioResampler while decoding. When None
+            audio is returned at the stream's native rate.
+        decoding_mode (str): One of VideoDecodingMode. Keyframe modes
+            return distinct frames, repeated only when the clip has fewer
+            than requested.
+        clip_duration_in_seconds (float | None): Length of a random window
+            to decode, the whole of ``[starting_second, ending_second]``
+            when None.
+
+    Returns:
+        A dictionary with ``video`` ``(N, H, W, C)`` and ``image``
+        ``(1, H, W, C)`` uint8 frames, and ``audio`` ``(num_samples,
+        channels)`` samples at ``audio_sample_rate``, for whichever were
+        requested, and the ``starting_second`` and ``ending_second`` of the
+        decoded window.
+    """
+    if not (return_video or return_image or return_audio):
+        raise ValueError(
+            "extract_clip_pyav needs at least one of return_video, "
+            "return_image or return_audio"
+        )
+    video_source = (
+        io.BytesIO(video_data) if isinstance(video_data, bytes) else video_data
+    )
+    output = {}
+
+    with av.open(video_source) as container:
+        if clip_duration_in_seconds is not None:
+            starting_second, ending_second = select_clip_window(
+                starting_second=starting_second,
+                ending_second=ending_second,
+                clip_duration_in_seconds=clip_duration_in_seconds,
+                duration=container_duration_in_seconds(container),
+                rng=rng,
+            )
+        output["starting_second"] = starting_second
+        output["ending_second"] = ending_second
+
+        video_stream = (
+            _first_stream(container, "video")
+            if return_video or return_image
+            else None
+        )
+        audio_stream = (
+            _first_stream(container, "audio") if return_audio else None
+        )
+        if audio_stream is not None:
+            audio_resampler = (
+                av.AudioResampler(
+                    format="fltp",
+                    layout="stereo" if stereo_audio_if_available else "mono",
+                    rate=audio_sample_rate,
+                )
+                if audio_sample_rate is not None
+                else None
+            )
+            audio_sample_rate = audio_sample_rate or audio_stream.rate
+            num_audio_samples = int(
+                audio_duration_in_seconds * audio_sample_rate
+            )
+
+        if (
+            video_stream is not None
+            and decoding_mode == VideoDecodingMode.KEYFRAMES
+        ):
+            video_stream.codec_context.skip_frame = "NONKEY"
+
+        plan = None
+        if (
+            video_stream is not None
+            and decoding_mode != VideoDecodingMode.KEYFRAMES
+        ):
+            plan = plan_video_frames(
+                container=container,
+                stream=video_stream,
+                starting_second=starting_second,
+                ending_second=ending_second,
+                num_frames=num_video_frames
+                + (1 if return_video and return_image else 0),
+                rng=rng,
+                frame_selection_method=frame_selection_method,
+                single_image_frame=return_image and not return_video,
+            )
+
+        video_frames = []
+        audio_chunks = []
+        planned_video = plan is not None and (
+            audio_stream is None
+            or decoding_mode == VideoDecodingMode.KEYFRAME_SEEKED
+        )
+        fps, slots = plan if plan is not None else (None, None)
+
+        if planned_video:
+            video_frames = decode_planned_video_frames(
+                container=container,
+                stream=video_stream,
+                starting_second=starting_second,
+                ending_second=ending_second,
+                fps=fps,
+                slots=slots,
+                seek_threshold_in_seconds=seek_threshold_in_seconds,
+                resize_shorter_side_to=resize_shorter_side_to,
+                nearest_keyframe=(
+                    decoding_mode == VideoDecodingMode.KEYFRAME_SEEKED
+                ),
+            )
+        if not planned_video or audio_stream is not None:
+            streams = [
+                stream
+                for stream in (
+                    None if planned_video else video_stream,
+                    audio_stream,
+                )
+                if stream is not None
+            ]
+            container = seek_to_second(container, streams[0], starting_second)
+
+            next_slot = 0
+            num_samples = 0
+            pre_roll = None
+            video_done = video_stream is None or planned_video
+            audio_done = audio_stream is None
+            earlier_keyframe = None
+
+            for packet in container.demux(streams):
+                if packet.stream is video_stream and not video_done:
+                    for frame in packet.decode():
+                        record_count("video_frames_decoded")
+                        timestamp = frame_timestamp_in_seconds(
+                            frame, video_stream
+                        )
+                        if timestamp > ending_second:
+                            video_done = True
+                            break
+                        if (
+                            decoding_mode == VideoDecodingMode.KEYFRAMES
+                            and timestamp < starting_second
+                        ):
+                            # Only kept when the clip holds no keyframe
+                            earlier_keyframe = frame
+                            continue
+                        if slots is not None:
+                            slot = round((timestamp - starting_second) * fps)
+                            if slot < slots[next_slot]:
+                                continue
+                            next_slot += 1
+                        video_frames.append(
+                            frame_to_tensor(
+                                frame,
+                                "video",
+                                resize_shorter_side_to=resize_shorter_side_to,
+                            )
+                        )
+                        video_done = (
+                            next_slot == len(slots)
+                            if slots is not None
+                            else not return_video
+                        )
+                        if video_done:
+                            break
+
+                elif packet.stream is audio_stream and not audio_done:
+                    for frame in packet.decode():
+                        record_count("audio_frames_decoded")
+                        timestamp = frame_timestamp_in_seconds(
+                            frame, audio_stream
+                        )
+                        if timestamp > ending_second:
+                            audio_done = True
+                            break
+                        array_frame = (
+                            torch.cat(
+                                [
+                                    frame_to_tensor(
+                                        resampled_frame,
+                                        "audio",
+                                        stereo_audio_if_available,
+                                    )
+                                    for resampled_frame in (
+                                        audio_resampler.resample(frame)
+                                    )
+                                ]
+                                or [torch.zeros((1, 0))],
+                                dim=1,
+                            )
+                            if audio_resampler is not None
+                            else frame_to_tensor(
+                                frame, "audio", stereo_audio_if_available
+                            )
+                        )
+                        # Seeking lands on a keyframe before the clip starts,
+                        # so drop the audio decoded ahead of starting_second.
+                        # Counting from the first frame keeps this exact when
+                        # the resampler emits unevenly sized chunks
+                        if pre_roll is None:
+                            pre_roll = max(
+                                int(
+                                    round(
+                                        (starting_second - timestamp)
+                                        * audio_sample_rate
+                                    )
+                                ),
+                                0,
+                            )
+                        if pre_roll > 0:
+                            num_dropped = min(pre_roll, array_frame.shape[1])
+                            array_frame = array_frame[:, num_dropped:]
+                            pre_roll -= num_dropped
+                        audio_chunks.append(array_frame)
+                        num_samples += array_frame.shape[1]
+                        if num_samples >= num_audio_samples:
+                            audio_done = True
+                            break
+
+                if video_done and audio_done:
+                    break
+
+            if len(video_frames) == 0 and earlier_keyframe is not None:
+                video_frames.append(
+                    frame_to_tensor(
+                        earlier_keyframe,
+                        "video",
+                        resize_shorter_side_to=resize_shorter_side_to,
+                    )
+                )
+
+            if not audio_done and audio_resampler is not None:
+                # The demuxer ran out first, flush the samples the
+                # resampler still holds back
+                for resampled_frame in audio_resampler.resample(None):
+                    array_frame = frame_to_tensor(
+                        resampled_frame, "audio", stereo_audio_if_available
+                    )
+                    num_dropped = min(pre_roll or 0, array_frame.shape[1])
+                    audio_chunks.append(array_frame[:, num_dropped:])
+                    pre_roll = (pre_roll or 0) - num_dropped
+
+    if video_stream is not None:
+        video_frames = (
+            torch.stack(video_frames)
+            if len(video_frames) > 0
+            else torch.zeros(
+                (
+                    0,
+                    *scaled_frame_size(
+                        video_stream.width,
+                        video_stream.height,
+                        resize_shorter_side_to,
+                    )[::-1],
+                    3,
+                ),
+                dtype=torch.uint8,
+            )
+        )
+        if slots is None:
+            video_frames = video_frames[
+                select_frame_indices(
+                    num_available_frames=len(video_frames),
+                    num_frames=(
+                        1
+                        if not return_video
+                        else num_video_frames + (1 if return_image else 0)
+                    ),
+                    rng=rng,
+                    frame_selection_method=(
+                        FrameSelectionMethod.SEQUENTIAL
+                        if not return_video
+                        else frame_selection_method
+                    ),
+                )
+            ]
+        if return_video and decoding_mode != VideoDecodingMode.ALL_FRAMES:
+            video_frames = repeat_to_num_frames(
+                video_frames, num_video_frames + (1 if return_image else 0)
+            )
+
+        record_count("video_frames_kept", len(video_frames))
+        if return_image:
+            output["image"] = video_frames[:1]
+            video_frames = video_frames[1:]
+        if return_video:
+            output["video"] = video_frames
+
+    if audio_stream is not None:
+        output["audio_sample_rate"] = audio_sample_rate
+        output["audio"] = (
+            torch.cat(audio_chunks, dim=1).permute(1, 0)[
+                : int(num_audio_samples)
+            ]
+            if len(audio_chunks) > 0
+            else torch.zeros((0, 1))
+        )
 
     return output
 
 
 def test_extract_frames_video_pyav():
-    video_path = "/data/datasets/tali-wit-2-1-buckets/video_data.parquet/550/550321/4chLRYT8ylY/360p_90.mp4"
-    video_path = "/data/datasets/tali-wit-2-1-buckets//video_data.parquet/10/10586/SA7bKo4HRTg/360p_0.mp4"
+    from tali.synthetic import synthesize_video
+
+    video_data = synthesize_video(duration_in_seconds=30)
     modality = "video"
     start_time = 10
     end_time = 20
@@ -154,7 +940,7 @@ def test_extract_frames_video_pyav():
             for key_frames_only in [False]:
                 start_fn_time = time.time()
                 frames = extract_frames_pyav(
-                    video_path=video_path,
+                    video_data=video_data,
                     modality=modality,
                     starting_second=start_time,
                     ending_second=end_time,
@@ -171,8 +957,9 @@ def test_extract_frames_video_pyav():
 
 
 def test_extract_frames_audio_pyav():
-    video_path = "/data/datasets/tali-wit-2-1-buckets/video_data.parquet/550/550321/4chLRYT8ylY/360p_90.mp4"
-    video_path = "/data/datasets/tali-wit-2-1-buckets//video_data.parquet/10/10586/SA7bKo4HRTg/360p_0.mp4"
+    from tali.synthetic import synthesize_video
+
+    video_data = synthesize_video(duration_in_seconds=30)
     modality = "audio"
     start_time = 10
     end_time = 20
@@ -189,7 +976,7 @@ def test_extract_frames_audio_pyav():
             for key_frames_only in [False]:
                 start_fn_time = time.time()
                 frames = extract_frames_pyav(
-                    video_path=video_path,
+                    video_data=video_data,
                     modality=modality,
                     starting_second=start_time,
                     ending_second=end_time,
@@ -206,7 +993,93 @@ def test_extract_frames_audio_pyav():
         )
 
 
+def test_keyframe_modes_stay_in_clip():
+    from tali.synthetic import synthesize_video
+
+    # 10 fps with a keyframe every 2 seconds, and a pattern that does not
+    # repeat within the video, so frames can be told apart
+    video_data = synthesize_video(
+        width=256,
+        height=32,
+        fps=10,
+        duration_in_seconds=6.0,
+        audio_sample_rate=0,
+        gop_size=20,
+    )
+    with av.open(io.BytesIO(video_data)) as container:
+        stream = container.streams.video[0]
+        reference = {
+            frame_timestamp_in_seconds(frame, stream): frame_to_tensor(
+                frame, "video"
+            ).float()
+            for frame in container.decode(stream)
+        }
+    timestamps, reference_frames = zip(*sorted(reference.items()))
+    reference_frames = torch.stack(reference_frames)
+
+    def frame_timestamps(frames):
+        return [
+            timestamps[
+                int(
+                    (reference_frames - frame.float())
+                    .abs()
+                    .mean(dim=(1, 2, 3))
+                    .argmin()
+                )
+            ]
+            for frame in frames
+        ]
+
+    for decoding_mode in [
+        VideoDecodingMode.KEYFRAMES,
+        VideoDecodingMode.KEYFRAME_SEEKED,
+    ]:
+        for starting_second, ending_second in [(1.3, 4.5), (3.0, 5.5)]:
+            output = extract_clip_pyav(
+                video_data=video_data,
+                starting_second=starting_second,
+                ending_second=ending_second,
+                rng=np.random.default_rng(0),
+                num_video_frames=4,
+                return_image=True,
+                frame_selection_method=FrameSelectionMethod.UNIFORM,
+                decoding_mode=decoding_mode,
+            )
+            frames = torch.cat([output["image"], output["video"]])
+            for timestamp in frame_timestamps(frames):
+                assert starting_second <= timestamp <= ending_second, (
+                    decoding_mode,
+                    timestamp,
+                )
+            frames = extract_frames_pyav(
+                video_data=video_data,
+                modality="video",
+                starting_second=starting_second,
+                ending_second=ending_second,
+                num_frames=4,
+                rng=np.random.default_rng(0),
+                decoding_mode=decoding_mode,
+            )
+            for timestamp in frame_timestamps(frames):
+                assert starting_second <= timestamp <= ending_second, (
+                    decoding_mode,
+                    timestamp,
+                )
+
+    # Without a keyframe in the clip the one before it is the best there is
+    frames = extract_frames_pyav(
+        video_data=video_data,
+        modality="video",
+        starting_second=2.5,
+        ending_second=3.5,
+        num_frames=2,
+        rng=np.random.default_rng(0),
+        decoding_mode=VideoDecodingMode.KEYFRAMES,
+    )
+    assert frame_timestamps(frames) == [2.0, 2.0]
+
+
 if __name__ == "__main__":
-    # test_extract_frames_torchvision()
-    # test_extract_frames_video_pyav()
+    test_extract_frames_video_pyav()
     test_extract_frames_audio_pyav()
+    test_keyframe_modes_stay_in_clip()
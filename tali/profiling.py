@@ -0,0 +1,157 @@
+import contextlib
+import json
+import multiprocessing as mp
+import queue
+import re
+import threading
+import time
+from collections import defaultdict
+
+_DISABLED_STAGE = contextlib.nullcontext()
+
+
+class StageProfiler:
+    """Accumulates wall time per named stage and named counters.
+
+    Disabled, ``stage`` hands back a shared no-op context manager and
+    ``count`` returns straight away, so instrumented code pays one
+    attribute check per call.
+    """
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self._lock = threading.RLock()
+        self.reset()
+
+    def reset(self):
+        # Per stage: number of calls, total and largest wall time in seconds
+        self.stages = defaultdict(lambda: [0, 0.0, 0.0])
+        self.counters = defaultdict(float)
+
+    @contextlib.contextmanager
+    def _timed_stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                stage = self.stages[name]
+                stage[0] += 1
+                stage[1] += elapsed
+                stage[2] = max(stage[2], elapsed)
+
+    def stage(self, name: str):
+        if not self.enabled:
+            return _DISABLED_STAGE
+        return self._timed_stage(name)
+
+    def count(self, name: str, value: float = 1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] += value
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "stages": {
+                    name: {
+                        "count": count,
+                        "total_seconds": total,
+                        "max_seconds": maximum,
+                    }
+                    for name, (count, total, maximum) in self.stages.items()
+                },
+                "counters": dict(self.counters),
+            }
+
+    def pop_snapshot(self) -> dict:
+        """The snapshot of everything recorded since the last pop."""
+        with self._lock:
+            snapshot = self.snapshot()
+            self.reset()
+        return snapshot
+
+    def merge(self, snapshot: dict):
+        with self._lock:
+            for name, stage in snapshot["stages"].items():
+                merged = self.stages[name]
+                merged[0] += stage["count"]
+                merged[1] += stage["total_seconds"]
+                merged[2] = max(merged[2], stage["max_seconds"])
+            for name, value in snapshot["counters"].items():
+                self.counters[name] += value
+
+    def to_json(self) -> str:
+        return json.dumps(self.snapshot(), indent=2)
+
+    def to_prometheus(self, prefix: str = "tali") -> str:
+        """The snapshot in the Prometheus text exposition format."""
+        snapshot = self.snapshot()
+        lines = [
+            f"# TYPE {prefix}_stage_calls_total counter",
+            f"# TYPE {prefix}_stage_seconds_total counter",
+            f"# TYPE {prefix}_stage_max_seconds gauge",
+        ]
+        for name, stage in sorted(snapshot["stages"].items()):
+            labels = f'{{stage="{name}"}}'
+            lines.append(
+                f"{prefix}_stage_calls_total{labels} {stage['count']}"
+            )
+            lines.append(
+                f"{prefix}_stage_seconds_total{labels} {stage['total_seconds']}"
+            )
+            lines.append(
+                f"{prefix}_stage_max_seconds{labels} {stage['max_seconds']}"
+            )
+        for name, value in sorted(snapshot["counters"].items()):
+            metric = f"{prefix}_{re.sub(r'[^a-zA-Z0-9_]', '_', name)}_total"
+            lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric} {value}")
+        return "\n".join(lines) + "\n"
+
+
+PROFILER = StageProfiler()
+
+
+def profile_stage(name: str):
+    """Times the body of a ``with`` block as stage ``name`` on the process
+    profiler, when it is enabled."""
+    return PROFILER.stage(name)
+
+
+def record_count(name: str, value: float = 1):
+    PROFILER.count(name, value)
+
+
+def enable_profiling(enabled: bool = True):
+    PROFILER.enabled = enabled
+
+
+class ProfilingSink:
+    """Collects profiler snapshots from DataLoader workers over a queue.
+
+    Pass it to TALIBaseTransform, which pushes the stages it recorded after
+    every call, and call collect in the main process to merge everything
+    received so far into ``profiler``.
+
+    Args:
+        context (str | None): Multiprocessing start method of the workers.
+    """
+
+    def __init__(self, context: str | None = None):
+        self.queue = mp.get_context(context).Queue()
+        self.profiler = StageProfiler(enabled=True)
+
+    def push(self, profiler: StageProfiler = PROFILER):
+        snapshot = profiler.pop_snapshot()
+        if len(snapshot["stages"]) > 0 or len(snapshot["counters"]) > 0:
+            self.queue.put(snapshot)
+
+    def collect(self) -> StageProfiler:
+        while True:
+            try:
+                self.profiler.merge(self.queue.get_nowait())
+            except queue.Empty:
+                return self.profiler
@@ -0,0 +1,137 @@
+import heapq
+from collections.abc import Iterator, Sequence
+from enum import Enum
+
+import datasets
+import numpy as np
+import torch
+
+
+class BatchBalancingMethod(Enum):
+    balanced = "balanced"
+    heavy_first = "heavy_first"
+
+
+class SizeBalancedBatchSampler(torch.utils.data.Sampler):
+    """Builds batches whose decoding costs are even or heavy-first.
+
+    The shuffled indices are cut into windows of ``window_size_in_batches``
+    batches. With ``balanced``, each window's items are spread over its
+    batches largest first, every item going to the cheapest batch that
+    still has room, so no batch waits on several large clips. With
+    ``heavy_first``, batches stay random, but within a window they are
+    yielded most expensive first and their items sorted the same way. The
+    slow decodes then start while the prefetched batches behind them are
+    still cheap.
+
+    Costs default to ``youtube_video_size``, see from_dataset. Measured
+    decode times can be fed back with update_costs and are used from the
+    next epoch on.
+
+    Use it as the ``batch_sampler`` of a DataLoader over a dataset with a
+    TALIBaseTransform set via ``set_transform``; ``datasets`` then hands the
+    transform each batch in one call.
+
+    Args:
+        costs (Sequence[float]): The cost of every row.
+        batch_size (int): Rows per batch.
+        method (str): One of BatchBalancingMethod.
+        window_size_in_batches (int): Batches balanced or reordered
+            together. Larger windows balance better but let the sample
+            order drift further from the shuffle.
+        shuffle (bool): Shuffle the rows every epoch.
+        drop_last (bool): Drop the last batch if it is incomplete.
+        seed (int): Seed for the shuffle, combined with the epoch.
+    """
+
+    def __init__(
+        self,
+        costs: Sequence[float],
+        batch_size: int,
+        method: str = BatchBalancingMethod.balanced.value,
+        window_size_in_batches: int = 32,
+        shuffle: bool = True,
+        drop_last: bool = False,
+        seed: int = 42,
+    ):
+        self.costs = np.asarray(costs, dtype=np.float64)
+        self.batch_size = batch_size
+        self.method = BatchBalancingMethod(method)
+        self.window_size_in_batches = window_size_in_batches
+        self.shuffle = shuffle
+        self.drop_last = drop_last
+        self.seed = seed
+        self.epoch = 0
+
+    @classmethod
+    def from_dataset(
+        cls,
+        dataset: datasets.Dataset,
+        batch_size: int,
+        cost_column: str = "youtube_video_size",
+        **kwargs,
+    ) -> "SizeBalancedBatchSampler":
+        """Reads the costs from ``cost_column`` of ``dataset``, which only
+        touches that column, not the video bytes."""
+        costs = dataset.with_format(None).select_columns([cost_column])[
+            cost_column
+        ]
+        return cls(costs=costs, batch_size=batch_size, **kwargs)
+
+    def set_epoch(self, epoch: int):
+        self.epoch = epoch
+
+    def update_costs(self, indices: Sequence[int], costs: Sequence[float]):
+        self.costs[np.asarray(indices, dtype=np.int64)] = costs
+
+    def __len__(self) -> int:
+        if self.drop_last:
+            return len(self.costs) // self.batch_size
+        return -(-len(self.costs) // self.batch_size)
+
+    def _balance(self, window: np.ndarray) -> list[list[int]]:
+        num_batches = -(-len(window) // self.batch_size)
+        capacities = [self.batch_size] * num_batches
+        capacities[-1] = len(window) - self.batch_size * (num_batches - 1)
+
+        batches = [[] for _ in range(num_batches)]
+        heap = [(0.0, batch_idx) for batch_idx in range(num_batches)]
+        for idx in window[np.argsort(-self.costs[window], kind="stable")]:
+            batch_cost, batch_idx = heapq.heappop(heap)
+            batches[batch_idx].append(int(idx))
+            if len(batches[batch_idx]) < capacities[batch_idx]:
+                heapq.heappush(heap, (batch_cost + self.costs[idx], batch_idx))
+        return batches
+
+    def _heavy_first(self, window: np.ndarray) -> list[list[int]]:
+        batches = [
+            sorted(
+                window[start : start + self.batch_size].tolist(),
+                key=lambda idx: -self.costs[idx],
+            )
+            for start in range(0, len(window), self.batch_size)
+        ]
+        return sorted(batches, key=lambda batch: -self.costs[batch].sum())
+
+    def __iter__(self) -> Iterator[list[int]]:
+        rng = np.random.default_rng((self.seed, self.epoch))
+        indices = (
+            rng.permutation(len(self.costs))
+            if self.shuffle
+            else np.arange(len(self.costs))
+        )
+        if self.drop_last:
+            indices = indices[: len(self) * self.batch_size]
+
+        window_size = self.window_size_in_batches * self.batch_size
+        for start in range(0, len(indices), window_size):
+            window = indices[start : start + window_size]
+            if self.method == BatchBalancingMethod.balanced:
+                batches = self._balance(window)
+                # Keep the balanced batches of a window in random order
+                batches = [
+                    batches[idx] for idx in rng.permutation(len(batches))
+                ]
+            else:
+                batches = self._heavy_first(window)
+            yield from batches
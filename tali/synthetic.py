@@ -0,0 +1,250 @@
+import io
+import pathlib
+from dataclasses import dataclass
+
+import av
+import datasets
+import numpy as np
+import yaml
+from PIL import Image
+
+from tali.data import WIKIPEDIA_ENTRY_KEYS, get_tali_features
+
+WIT_BOOLEAN_KEYS = (
+    "attribution_passes_lang_id",
+    "is_main_image",
+    "page_changed_recently",
+)
+WIT_TEXT_KEYS = tuple(WIKIPEDIA_ENTRY_KEYS) + ("page_url",)
+SYNTHETIC_WORDS = (
+    "river mountain city music lecture history football cooking garden "
+    "station bridge market science village festival island engine forest "
+    "painting theatre harbour library museum castle desert"
+).split()
+
+
+@dataclass
+class SyntheticDatasetConfig:
+    """Settings of a synthetic TALI dataset, see write_synthetic_dataset.
+
+    Clip durations are drawn uniformly from ``duration_in_seconds`` plus or
+    minus ``duration_jitter_in_seconds``, which together with the
+    resolution, fps and ``video_bit_rate`` sets the ``youtube_video_size``
+    distribution.
+    """
+
+    num_rows: int = 32
+    rows_per_shard: int = 16
+    splits: tuple[str, ...] = ("train", "val", "test")
+    width: int = 640
+    height: int = 360
+    fps: int = 30
+    duration_in_seconds: float = 30.0
+    duration_jitter_in_seconds: float = 0.0
+    video_bit_rate: int | None = None
+    gop_size: int = 60
+    audio_sample_rate: int = 44100
+    audio_channels: int = 2
+    image_width: int = 640
+    image_height: int = 480
+    languages: tuple[str, ...] = ("en", "fr", "de", "es", "el")
+    max_languages_per_row: int = 3
+    subtitle_interval_in_seconds: float = 2.0
+    seed: int = 42
+
+
+def synthesize_video(
+    width: int = 640,
+    height: int = 360,
+    fps: int = 30,
+    duration_in_seconds: float = 30.0,
+    audio_sample_rate: int = 44100,
+    audio_channels: int = 2,
+    video_bit_rate: int | None = None,
+    gop_size: int = 60,
+    seed: int = 42,
+) -> bytes:
+    """Encodes an H.264/AAC MP4 of a scrolling noise pattern and a tone.
+
+    Args:
+        width (int): Frame width.
+        height (int): Frame height.
+        fps (int): Frames per second.
+        duration_in_seconds (float): Length of both streams.
+        audio_sample_rate (int): Audio sample rate, no audio stream when 0.
+        audio_channels (int): 1 for mono, 2 for stereo.
+        video_bit_rate (int | None): Target bit rate, libx264's default
+            quality when None.
+        gop_size (int): Frames between keyframes.
+        seed (int): Seed for the pattern.
+
+    Returns:
+        bytes: The MP4 file.
+    """
+    rng = np.random.default_rng(seed)
+    buffer = io.BytesIO()
+    container = av.open(buffer, mode="w", format="mp4")
+
+    video_stream = container.add_stream("libx264", rate=fps)
+    video_stream.width = width
+    video_stream.height = height
+    video_stream.pix_fmt = "yuv420p"
+    video_stream.options = {"g": str(gop_size)}
+    if video_bit_rate is not None:
+        video_stream.bit_rate = video_bit_rate
+
+    audio_stream = None
+    if audio_sample_rate > 0:
+        audio_stream = container.add_stream("aac", rate=audio_sample_rate)
+        audio_stream.layout = "stereo" if audio_channels == 2 else "mono"
+
+    pattern = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+    for frame_idx in range(int(round(fps * duration_in_seconds))):
+        frame = av.VideoFrame.from_ndarray(
+            np.roll(pattern, frame_idx * 4, axis=1), format="rgb24"
+        )
+        container.mux(video_stream.encode(frame))
+    container.mux(video_stream.encode())
+
+    if audio_stream is not None:
+        frequency = rng.uniform(200, 1000)
+        num_samples = int(audio_sample_rate * duration_in_seconds)
+        for start in range(0, num_samples, 1024):
+            seconds = np.arange(start, start + 1024) / audio_sample_rate
+            samples = (0.3 * np.sin(2 * np.pi * frequency * seconds)).astype(
+                np.float32
+            )
+            frame = av.AudioFrame.from_ndarray(
+                np.repeat(samples, audio_channels).reshape(1, -1),
+                format="flt",
+                layout=audio_stream.layout.name,
+            )
+            frame.sample_rate = audio_sample_rate
+            frame.pts = start
+            container.mux(audio_stream.encode(frame))
+        container.mux(audio_stream.encode())
+
+    container.close()
+    return buffer.getvalue()
+
+
+def _words(rng: np.random.Generator, num_words: int) -> str:
+    return " ".join(rng.choice(SYNTHETIC_WORDS, size=num_words))
+
+
+def synthesize_row(
+    item_idx: int, config: SyntheticDatasetConfig, rng: np.random.Generator
+) -> dict:
+    """A TALI row with a synthetic clip, Wikipedia image and text."""
+    duration_in_seconds = config.duration_in_seconds + rng.uniform(
+        -config.duration_jitter_in_seconds, config.duration_jitter_in_seconds
+    )
+    video = synthesize_video(
+        width=config.width,
+        height=config.height,
+        fps=config.fps,
+        duration_in_seconds=max(duration_in_seconds, 1.0 / config.fps),
+        audio_sample_rate=config.audio_sample_rate,
+        audio_channels=config.audio_channels,
+        video_bit_rate=config.video_bit_rate,
+        gop_size=config.gop_size,
+        seed=config.seed + item_idx,
+    )
+
+    image = io.BytesIO()
+    Image.fromarray(
+        rng.integers(
+            0,
+            256,
+            (config.image_height, config.image_width, 3),
+            dtype=np.uint8,
+        )
+    ).save(image, format="JPEG")
+
+    languages = list(
+        rng.choice(
+            config.languages,
+            size=rng.integers(1, config.max_languages_per_row + 1),
+            replace=False,
+        )
+    )
+    wit_features = {
+        key: [_words(rng, rng.integers(2, 40)) for _ in languages]
+        for key in WIT_TEXT_KEYS
+    }
+    wit_features.update(
+        {
+            key: [bool(rng.integers(2)) for _ in languages]
+            for key in WIT_BOOLEAN_KEYS
+        }
+    )
+    wit_features["language"] = languages
+
+    starting_time = int(rng.integers(0, 600))
+    subtitles = {
+        f"{timestamp:.1f}": _words(rng, rng.integers(3, 12))
+        for timestamp in np.arange(
+            max(starting_time - 10, 0),
+            starting_time + duration_in_seconds + 10,
+            config.subtitle_interval_in_seconds,
+        )
+    }
+
+    return {
+        "image": {"bytes": image.getvalue(), "path": None},
+        "image_url": f"https://upload.wikimedia.org/synthetic/{item_idx}.jpg",
+        "item_idx": item_idx,
+        "wit_features": wit_features,
+        "wit_idx": item_idx,
+        "youtube_title_text": _words(rng, rng.integers(3, 12)),
+        "youtube_description_text": _words(rng, rng.integers(10, 80)),
+        "youtube_video_content": video,
+        "youtube_video_starting_time": str(starting_time),
+        "youtube_subtitle_text": yaml.safe_dump(subtitles),
+        "youtube_video_size": len(video),
+        "youtube_video_file_path": f"synthetic/{item_idx}/360p_{starting_time}.mp4",
+    }
+
+
+def write_synthetic_dataset(
+    dataset_path: pathlib.Path | str,
+    config: SyntheticDatasetConfig | None = None,
+) -> pathlib.Path:
+    """Writes TALI-compatible parquet shards with synthetic content.
+
+    Every split gets ``config.num_rows`` rows in shards of
+    ``config.rows_per_shard``, named like the hub shards and using the
+    exact features of get_tali_features, so the result loads with
+    load_dataset_from_parquet.
+
+    Args:
+        dataset_path (pathlib.Path | str): Directory to write the shards to.
+        config (SyntheticDatasetConfig | None): Defaults when None.
+
+    Returns:
+        pathlib.Path: ``dataset_path``.
+    """
+    config = config or SyntheticDatasetConfig()
+    dataset_path = pathlib.Path(dataset_path)
+    dataset_path.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(config.seed)
+    features = get_tali_features()
+
+    item_idx = 0
+    num_shards = -(-config.num_rows // config.rows_per_shard)
+    for split in config.splits:
+        for shard_idx in range(num_shards):
+            num_rows = min(
+                config.rows_per_shard,
+                config.num_rows - shard_idx * config.rows_per_shard,
+            )
+            rows = []
+            for _ in range(num_rows):
+                rows.append(synthesize_row(item_idx, config, rng))
+                item_idx += 1
+            datasets.Dataset.from_list(rows, features=features).to_parquet(
+                dataset_path
+                / f"{split}-{shard_idx:05d}-of-{num_shards:05d}.parquet"
+            )
+
+    return dataset_path
@@ -1,9 +1,42 @@
+import importlib
 import logging
+import sys
+import types
 
-from rich.logging import RichHandler
+
+class _LazyModule(types.ModuleType):
+    """Stands in for a module and imports it on first attribute access,
+    after which its attributes are read directly."""
+
+    def _load(self) -> types.ModuleType:
+        module = self.__dict__.get("_module")
+        if module is None:
+            module = importlib.import_module(self.__name__)
+            self.__dict__.update(module.__dict__)
+            self.__dict__["_module"] = module
+        return module
+
+    def __getattr__(self, name: str):
+        value = getattr(self._load(), name)
+        self.__dict__[name] = value
+        return value
+
+
+def lazy_import(name: str) -> types.ModuleType:
+    """Returns module ``name``, deferring its import until an attribute of
+    it is first used, unless it has already been imported."""
+    if name in sys.modules:
+        return sys.modules[name]
+    return _LazyModule(name)
 
 
 def enrichen_logger(logger: logging.Logger):
+    from rich.logging import RichHandler
+
+    # Loggers are shared, so only ever give them one rich handler
+    if any(isinstance(handler, RichHandler) for handler in logger.handlers):
+        return logger
+
     ch = RichHandler()
 
     # create formatter